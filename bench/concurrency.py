@@ -0,0 +1,74 @@
+"""Vote throughput of the database backends with many threads voting at once, into one shared game or into one game
+per thread, and a check that no vote got lost on the way.
+
+    poetry run python -m bench.concurrency [--threads 8] [--players 50] [--items 10]
+"""
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bench.points import build_game
+from voting24.db.database import Database, InMemoryDatabase
+from voting24.db.file_database import FileDatabase
+from voting24.db.sqlite_database import SqliteDatabase
+from voting24.game.game import Game
+
+_backends: dict[str, Callable[[Path], Database]] = {
+    "memory": lambda _: InMemoryDatabase(),
+    "file": FileDatabase,
+    "file (journal)": lambda path: FileDatabase(path, journal=True),
+    "sqlite": lambda path: SqliteDatabase(path / "voting.db"),
+}
+
+
+def _play(database: Database, game: Game, thread: int, players: int) -> None:
+    for p in range(players):
+        player_name = f"player {thread}-{p}"
+        database.join_game(game.key, player_name)
+        for item in game.items:
+            database.vote(player_name, game.key, item.key, item.options[-1].key)
+
+
+def run(database: Database, threads: int, players: int, items: int, *, shared: bool) -> float:
+    games = [build_game(items, 0) for _ in range(1 if shared else threads)]
+    for g, game in enumerate(games):
+        game.key = f"game{g}"
+        database.save_game(game)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(_play, database, games[t % len(games)], t, players) for t in range(threads)]
+    for future in futures:
+        future.result()
+    seconds = time.perf_counter() - start
+
+    for game in games:
+        votes = sum(len(player.votes) for player in database.load_game(game.key).players)
+        expected = threads // len(games) * players * items
+        if votes != expected:
+            msg = f"{game.key}: expected {expected} votes, found {votes}"
+            raise AssertionError(msg)
+    return threads * players * items / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--items", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.players} players each voting on {args.items} items")
+    for name, backend in _backends.items():
+        rates = []
+        for shared in (True, False):
+            with tempfile.TemporaryDirectory() as tmp:
+                rates.append(run(backend(Path(tmp)), args.threads, args.players, args.items, shared=shared))
+        print(f"{name:16} one game {rates[0]:10,.0f} votes/s  game per thread {rates[1]:10,.0f} votes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare join, vote and results throughput of the persistent database backends.
+
+    poetry run python -m bench.databases [--players 500] [--items 26] [--results 200] [--batch 50]
+
+The batched column votes again with vote_many, batch votes at a time, which is what the vote batching of the web
+app does when many players vote at the same time.
+"""
+import argparse
+import random
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from bench.points import build_game
+from voting24.db.database import Database
+from voting24.db.file_database import FileDatabase
+from voting24.db.sqlite_database import SqliteDatabase
+
+_backends: dict[str, Callable[[Path], Database]] = {
+    "file": FileDatabase,
+    "file (journal)": lambda path: FileDatabase(path, journal=True),
+    "sqlite": lambda path: SqliteDatabase(path / "voting.db"),
+}
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:12,.0f}/s"
+
+
+def run(name: str, database: Database, players: int, items: int, results: int, batch: int) -> None:  # noqa: PLR0913, PLR0917
+    rng = random.Random(24)
+    game = build_game(items, 0)
+    database.save_game(game)
+    player_names = [f"player {p}" for p in range(players)]
+
+    start = time.perf_counter()
+    for player_name in player_names:
+        database.join_game(game.key, player_name)
+    joins = time.perf_counter() - start
+
+    votes = [
+        (player_name, item.key, rng.choice(item.options).key)
+        for player_name in player_names
+        for item in game.items
+    ]
+    start = time.perf_counter()
+    for player_name, item_key, vote_key in votes:
+        database.vote(player_name, game.key, item_key, vote_key)
+    voting = time.perf_counter() - start
+
+    rng.shuffle(votes)
+    start = time.perf_counter()
+    for i in range(0, len(votes), batch):
+        database.vote_many(game.key, votes[i:i + batch])
+    batched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(results):
+        database.results(game.key)
+    points = time.perf_counter() - start
+
+    print(
+        f"{name:16} join {_rate(players, joins)}  vote {_rate(len(votes), voting)}"
+        f"  batched {_rate(len(votes), batched)}  results {_rate(results, points)}",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--items", type=int, default=26)
+    parser.add_argument("--results", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{args.items} items, {args.players} players voting on every item, {args.results} result reads")
+    for name, backend in _backends.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            database = backend(Path(tmp))
+            try:
+                run(name, database, args.players, args.items, args.results, args.batch)
+            finally:
+                database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Simulate a live voting night: players join a game and vote their way through the items while spectators poll the
+results, and report throughput and latencies per route for every database backend.
+
+Half of the players vote the way htmx does (hx-request, the next item comes back as a fragment), the others follow the
+redirects of the plain form. Spectators poll results.htmx every --poll seconds with the ETag of the last response, as
+the browser does. Without --think the players vote as fast as the app answers, so the latencies only tell how many
+players are waiting: about players / requests per second.
+
+By default the app is driven in-process, once per backend, with the database in a temporary directory. With --url a
+running server is driven over HTTP instead. The game is then created through the server's database, so DATABASE_DIR
+or DATABASE_SQLITE have to be set the same as for the server.
+
+In-process the load generator competes with the app for the same interpreter, so the backends are CPU bound, and
+while the event loop is blocked the clients can't measure. With --tcp the app is served by uvicorn in a thread with
+an event loop of its own instead. --storage-latency-ms adds a delay to every write, one write at a time like a disk
+flushing its cache, to see how the app copes with slow storage, and --no-offload calls the database on the event loop
+instead of in worker threads to compare.
+
+    poetry run python -m bench.load [--players 500] [--spectators 50] [--items 26] [--backend all]
+        [--ramp 0] [--think 0] [--poll 1] [--batch-window-ms 0] [--storage-latency-ms 0] [--no-offload]
+        [--tcp | --url http://localhost:8000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Generator
+from contextlib import AsyncExitStack, contextmanager
+from dataclasses import dataclass
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from bench.points import build_game
+from voting24.db.database import Database
+from voting24.game.game import Game
+from voting24.web.dependencies import create_database
+
+_backends: dict[str, dict[str, str]] = {
+    "memory": {},
+    "file": {"DATABASE_DIR": "{tmp}"},
+    "file (journal)": {"DATABASE_DIR": "{tmp}", "DATABASE_JOURNAL": "1"},
+    "sqlite": {"DATABASE_SQLITE": "{tmp}/voting.db"},
+}
+
+
+@dataclass
+class Summary:
+    backend: str
+    requests: int
+    elapsed: float
+    errors: int
+    vote_p99: float
+    results_p99: float
+
+
+class Latencies:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def measure(self, route: str, request: Awaitable[httpx.Response]) -> httpx.Response:
+        start = time.perf_counter()
+        response = await request
+        self.samples[route].append(time.perf_counter() - start)
+        self.statuses[route][response.status_code] += 1
+        # In-process requests to a database that never blocks don't give the event loop a chance to run anything
+        # else, over the network every request would
+        await asyncio.sleep(0)
+        return response
+
+    def errors(self) -> int:
+        return sum(
+            count for statuses in self.statuses.values() for status, count in statuses.items() if status >= 400  # noqa: PLR2004
+        )
+
+    def p99(self, *routes: str) -> float:
+        samples = [sample for route in routes for sample in self.samples.get(route, [])]
+        return _percentiles(samples)[98] if samples else 0
+
+    def report(self, backend: str, elapsed: float) -> Summary:
+        total = sum(len(samples) for samples in self.samples.values())
+        print(f"\n{backend}: {total} requests in {elapsed:.1f} s, {total / elapsed:,.0f} requests/s")
+        print(
+            f"  {'route':10} {'count':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+            "  statuses",
+        )
+        for route, samples in self.samples.items():
+            percentiles = _percentiles(samples)
+            statuses = " ".join(f"{status}:{count}" for status, count in sorted(self.statuses[route].items()))
+            print(
+                f"  {route:10} {len(samples):8} {len(samples) / elapsed:8,.0f} {percentiles[49] * 1e3:8.1f} "
+                f"{percentiles[94] * 1e3:8.1f} {percentiles[98] * 1e3:8.1f} {max(samples) * 1e3:8.1f}  {statuses}",
+            )
+        return Summary(backend, total, elapsed, self.errors(), self.p99("vote", "vote (hx)"), self.p99("results"))
+
+
+def _percentiles(samples: list[float]) -> list[float]:
+    if len(samples) < 2:  # noqa: PLR2004
+        return samples * 99
+    # inclusive stays within the observed samples, the default extrapolates past the max on small samples
+    return statistics.quantiles(samples, n=100, method="inclusive")
+
+
+async def play(
+    client: httpx.AsyncClient,
+    game: Game,
+    player: int,
+    args: argparse.Namespace,
+    latencies: Latencies,
+) -> None:
+    rng = random.Random(player)
+    player_name = f"player_{player}"
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    await latencies.measure("join", client.post(f"/game/{game.key}/join", data={"player_name": player_name}))
+    headers = {"cookie": f"player_name={player_name}"}
+    forward = await latencies.measure("forward", client.get(f"/game/{game.key}/item", headers=headers))
+    await latencies.measure("item", client.get(forward.headers["location"], headers=headers))
+    hx = player % 2 == 0
+    for item in game.items:
+        # a player listens to the song before voting, on average for think seconds
+        await asyncio.sleep(rng.uniform(0, 2 * args.think))
+        vote = {"vote": rng.choice(item.options).key}
+        if hx:
+            # the response is the next item, there is no separate page load
+            await latencies.measure("vote (hx)", client.post(
+                f"/game/{game.key}/item/{item.key}",
+                data=vote,
+                headers=headers | {"hx-request": "true"},
+            ))
+            continue
+        response = await latencies.measure("vote", client.post(
+            f"/game/{game.key}/item/{item.key}",
+            data=vote,
+            headers=headers,
+        ))
+        if response.headers.get("location", "").startswith(f"/game/{game.key}/item/"):
+            await latencies.measure("item", client.get(response.headers["location"], headers=headers))
+
+
+async def spectate(
+    client: httpx.AsyncClient,
+    game: Game,
+    poll: float,
+    done: asyncio.Event,
+    latencies: Latencies,
+) -> None:
+    await asyncio.sleep(random.uniform(0, poll))
+    etag = None
+    while not done.is_set():
+        response = await latencies.measure(
+            "results",
+            client.get(f"/game/{game.key}/results.htmx", headers={"if-none-match": etag} if etag else {}),
+        )
+        etag = response.headers.get("etag", etag)
+        await asyncio.sleep(poll)
+
+
+def slow_down_writes(database: Database, latency: float) -> None:
+    storage = threading.Lock()
+
+    def slowed(write: Callable[..., object]) -> Callable[..., object]:
+        def slow_write(*args: object, **kwargs: object) -> object:
+            with storage:
+                time.sleep(latency)
+            return write(*args, **kwargs)
+
+        return slow_write
+
+    # vote goes through vote_many in every backend
+    for name in ("save_game", "join_game", "vote_many"):
+        setattr(database, name, slowed(getattr(database, name)))
+
+
+@contextmanager
+def serve(app: FastAPI) -> Generator[str, None, None]:
+    # The app gets an event loop of its own in another thread, so that the clients notice when it's blocked. Waiting
+    # for storage releases the interpreter, the clients keep running and measuring.
+    # players think longer than the default keep-alive of 5 s, the connections must not close under them
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", timeout_keep_alive=300),
+    )
+    thread = threading.Thread(target=server.run)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def run(args: argparse.Namespace, backend: str) -> Summary:
+    game = build_game(args.items, 0)
+    async with AsyncExitStack() as stack:
+        url = args.url
+        if url:
+            create_database().save_game(game)
+        else:
+            from voting24.web.app import app  # noqa: PLC0415  # the environment has to be set first
+
+            if args.tcp:
+                url = stack.enter_context(serve(app))
+            else:
+                # the ASGI transport doesn't run the lifespan, which creates the database
+                await stack.enter_async_context(app.router.lifespan_context(app))
+            app.state.database.save_game(game)
+            if args.storage_latency_ms:
+                slow_down_writes(app.state.database, args.storage_latency_ms / 1000)
+            if args.no_offload:
+                # blocking is a class variable, mypy won't allow assigning it on the instance
+                setattr(app.state.database, "blocking", False)  # noqa: B010
+        if url:
+            connections = min(args.players + args.spectators, 256)
+            transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            )
+        else:
+            transport = httpx.ASGITransport(app=app)
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url=url or "http://bench", timeout=300),
+        )
+        latencies = Latencies()
+        done = asyncio.Event()
+        spectators = [
+            asyncio.create_task(spectate(client, game, args.poll, done, latencies)) for _ in range(args.spectators)
+        ]
+        start = time.perf_counter()
+        await asyncio.gather(*(play(client, game, p, args, latencies) for p in range(args.players)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*spectators)
+        return latencies.report(backend, elapsed)
+
+
+def run_backend(args: argparse.Namespace, backend: str) -> Summary:
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("DATABASE_DIR", "DATABASE_JOURNAL", "DATABASE_SQLITE"):
+            os.environ.pop(name, None)
+        os.environ.update({name: value.format(tmp=tmp) for name, value in _backends[backend].items()})
+        if args.batch_window_ms:
+            os.environ["VOTE_BATCH_WINDOW_MS"] = str(args.batch_window_ms)
+        return asyncio.run(run(args, backend))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--spectators", type=int, default=50)
+    parser.add_argument("--items", type=int, default=26)
+    parser.add_argument("--backend", choices=["all", *_backends], default="all")
+    parser.add_argument("--ramp", type=float, default=0, help="seconds over which the players join")
+    parser.add_argument("--think", type=float, default=0, help="average seconds a player takes to vote")
+    parser.add_argument("--poll", type=float, default=1, help="seconds between the polls of a spectator")
+    parser.add_argument("--batch-window-ms", type=float, default=0, help="VOTE_BATCH_WINDOW_MS of the app")
+    parser.add_argument("--storage-latency-ms", type=float, default=0, help="delay added to every write")
+    parser.add_argument("--no-offload", action="store_true", help="call the database on the event loop")
+    parser.add_argument("--tcp", action="store_true", help="serve the app in a thread and drive it over TCP")
+    parser.add_argument("--url", help="drive a running server instead of the app in-process")
+    args = parser.parse_args()
+
+    print(
+        f"{args.players} players voting on {args.items} items joining over {args.ramp:g} s, thinking {args.think:g} s, "
+        f"{args.spectators} spectators polling every {args.poll:g} s",
+    )
+    if args.url:
+        asyncio.run(run(args, args.url))
+        return
+    summaries = [
+        run_backend(args, backend) for backend in (_backends if args.backend == "all" else [args.backend])
+    ]
+    print(f"\n  {'backend':16} {'requests/s':>10} {'errors':>8} {'vote p99 ms':>12} {'results p99 ms':>15}")
+    for summary in summaries:
+        print(
+            f"  {summary.backend:16} {summary.requests / summary.elapsed:10,.0f} {summary.errors:8} "
+            f"{summary.vote_p99 * 1e3:12.1f} {summary.results_p99 * 1e3:15.1f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Time the hot paths of the game model at a realistic and at extreme numbers of players, write the results as JSON and
+compare them with a stored baseline, to catch a change to voting24/game/game.py that slows them down.
+
+    poetry run python -m bench.model [--items 26] [--players 10 1000 100000] [--repeat 7]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.2] [--min-delta 1e-6]
+
+With --baseline the exit status is 1 when any case got slower by more than the tolerance. Record a baseline on the same
+machine with --output before making the change, e.g. `python -m bench.model --output baseline.json`.
+
+Timings of the same code vary from run to run, most of all for the cases that take microseconds. A case only counts
+as slower when it is also slower than the spread between the repeats of both runs allows and by more than --min-delta
+seconds, and it is measured once more to confirm before failing.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+import pydantic
+
+from bench.points import build_game
+from voting24.game.game import Game, GameMetadata
+
+
+def cases(game: Game) -> dict[str, Callable[[], object]]:
+    # the last player joined last, so finding them is the slow case
+    player_name = game.players[-1].name
+    game_json = game.model_dump_json()
+    game_dict = game.model_dump()
+    metadata_json = GameMetadata.model_validate(game_dict).model_dump_json()
+    return {
+        "points": game.points,
+        "results": game.results,
+        "votes": game.votes,
+        "next_unvoted_item": partial(game.next_unvoted_item, player_name),
+        "player": partial(game.player, player_name),
+        # imported games are validated, the databases load what they stored themselves as trusted
+        "model_validate_json": partial(Game.model_validate_json, game_json),
+        "model_validate": partial(Game.model_validate, game_dict),
+        "from_trusted_json": partial(Game.from_trusted_json, game_json),
+        "from_trusted": partial(Game.from_trusted, game_dict),
+        # most pages only read the metadata, which does not depend on the players
+        "metadata_validate_json": partial(GameMetadata.model_validate_json, metadata_json),
+        "model_dump_json": game.model_dump_json,
+    }
+
+
+@dataclass
+class Timing:
+    seconds: float  # per call, the best of the repeats
+    spread: float  # how much slower the median repeat was than the best one, 0.1 = 10%
+
+
+def measure(call: Callable[[], object], repeat: int) -> Timing:
+    # repeat runs of enough calls to take at least 0.2 s each
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    runs = timer.repeat(repeat=repeat, number=number)
+    return Timing(min(runs) / number, statistics.median(runs) / min(runs) - 1)
+
+
+def run(items: int, players: list[int], repeat: int, only: set[str] | None = None) -> dict[str, Timing]:
+    results: dict[str, Timing] = {}
+    for player_count in players:
+        game = build_game(items, player_count)
+        for name, call in cases(game).items():
+            case = f"{name}[{items}x{player_count}]"
+            if only is not None and case not in only:
+                continue
+            results[case] = measure(call, repeat)
+            print(f"  {case:36} {_format(results[case].seconds):>12}  ±{results[case].spread:.0%}", flush=True)
+    return results
+
+
+def slower(now: Timing, before: Timing, tolerance: float, min_delta: float) -> bool:
+    # noise in either run widens the tolerance, and differences too small to measure reliably never count
+    return (
+        now.seconds - before.seconds > min_delta
+        and now.seconds / before.seconds - 1 > tolerance + now.spread + before.spread
+    )
+
+
+def compare(results: dict[str, Timing], baseline: dict[str, Timing], tolerance: float, min_delta: float) -> list[str]:
+    print(f"\n  {'case':36} {'baseline':>12} {'now':>12} {'change':>8}")
+    regressions = []
+    for case, timing in results.items():
+        if case not in baseline:
+            continue
+        regressed = slower(timing, baseline[case], tolerance, min_delta)
+        if regressed:
+            regressions.append(case)
+        print(
+            f"  {case:36} {_format(baseline[case].seconds):>12} {_format(timing.seconds):>12}"
+            f" {timing.seconds / baseline[case].seconds - 1:+8.0%}{'  slower' if regressed else ''}",
+        )
+    return regressions
+
+
+def _load_baseline(path: Path) -> dict[str, Timing]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    spreads = data.get("spread", {})
+    return {case: Timing(seconds, spreads.get(case, 0.0)) for case, seconds in data["seconds"].items()}
+
+
+def _format(seconds: float) -> str:
+    if seconds >= 1e-3:  # noqa: PLR2004
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.3f} us"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=26)
+    parser.add_argument("--players", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--output", type=Path, help="write the results to this json file")
+    parser.add_argument("--baseline", type=Path, help="compare with the results in this json file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown allowed before failing, 0.2 = 20%%")
+    parser.add_argument("--min-delta", type=float, default=1e-6, help="smallest slowdown in seconds that can fail")
+    args = parser.parse_args()
+
+    print(f"{args.items} items x {', '.join(map(str, args.players))} players, best of {args.repeat}")
+    results = run(args.items, args.players, args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps({
+            "python": platform.python_version(),
+            "pydantic": pydantic.VERSION,
+            "machine": platform.machine(),
+            "seconds": {case: timing.seconds for case, timing in results.items()},
+            "spread": {case: timing.spread for case, timing in results.items()},
+        }, indent=2) + "\n", encoding="utf-8")
+    if args.baseline:
+        baseline = _load_baseline(args.baseline)
+        if suspects := compare(results, baseline, args.tolerance, args.min_delta):
+            # a second measurement that is not slower means the first one was noise
+            print(f"\nMeasuring {len(suspects)} cases again")
+            again = run(args.items, args.players, args.repeat, only=set(suspects))
+            regressions = [
+                case for case in suspects if slower(again[case], baseline[case], args.tolerance, args.min_delta)
+            ]
+            if regressions:
+                names = ", ".join(regressions)
+                print(f"\n{len(regressions)} cases got slower by more than {args.tolerance:.0%}: {names}")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare reading the results from the running tally against recomputing them from every player's votes, and
+listing the voters of every item in one pass over the votes against going through all players once per item.
+
+    poetry run python -m bench.points [--players 100000] [--items 26]
+"""
+import argparse
+import random
+import timeit
+
+from voting24.game.game import Choice, Game, Player, Value, VoteItem
+
+_choices = [
+    Choice(key="hateit", text="🤮", value=-2),
+    Choice(key="dislikeit", text="🤢", value=-1),
+    Choice(key="neutral", text="🤷", value=0),
+    Choice(key="likeit", text="🤩", value=1),
+    Choice(key="loveit", text="😍", value=2),
+    Choice(key="absolutefav", text="💖", value=4),
+]
+
+
+def build_game(items: int, players: int, seed: int = 24) -> Game:
+    rng = random.Random(seed)
+    vote_items = [VoteItem(key=f"item-{i}", title=f"Item {i}", text="", options=_choices) for i in range(items)]
+    return Game(
+        key="bench",
+        name="Benchmark",
+        items=vote_items,
+        players=[
+            Player(
+                name=f"player {p}",
+                votes={item.key: rng.choice(_choices).key for item in vote_items if rng.random() < 0.9},  # noqa: PLR2004
+            )
+            for p in range(players)
+        ],
+    )
+
+
+# This is what Game.points() did before it was backed by a tally
+def recomputed_points(game: Game) -> dict[VoteItem, Value]:
+    return {
+        item: sum(
+            next(choice.value for choice in item.options if choice.key == itemkey)
+            for itemkey
+            in [player.votes[item.key] for player in players]
+        )
+        for item, players
+        in game.votes().items()
+    }
+
+
+# This is what Game.votes() did before it went through the votes once
+def comprehension_votes(game: Game) -> dict[VoteItem, list[Player]]:
+    return {item: [player for player in game.players if player.votes.get(item.key)] for item in game.items}
+
+
+def _best_of(stmt: str, namespace: dict[str, object], number: int) -> float:
+    return min(timeit.repeat(stmt, globals=namespace, number=number, repeat=5)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=26)
+    args = parser.parse_args()
+
+    game = build_game(args.items, args.players)
+    assert game.points() == recomputed_points(game)  # noqa: S101
+    assert game.votes() == comprehension_votes(game)  # noqa: S101
+
+    namespace = {"game": game, "recomputed_points": recomputed_points, "comprehension_votes": comprehension_votes}
+    recomputed = _best_of("recomputed_points(game)", namespace, number=3)
+    tallied = _best_of("game.points()", namespace, number=1000)
+    results = _best_of("game.results()", namespace, number=1000)
+    comprehension = _best_of("comprehension_votes(game)", namespace, number=3)
+    one_pass = _best_of("game.votes()", namespace, number=3)
+    vote = _best_of("game.set_vote(game.players[0], game.items[0].key, 'loveit')", namespace, number=1000)
+
+    print(f"{args.items} items x {args.players} players")
+    print(f"  recomputed points(): {recomputed * 1e3:10.3f} ms")
+    print(f"  tallied points():    {tallied * 1e3:10.3f} ms  ({recomputed / tallied:,.0f}x faster)")
+    print(f"  results():           {results * 1e3:10.3f} ms  (scores, counts, means, histograms and ranks)")
+    print(f"  votes() per item:    {comprehension * 1e3:10.3f} ms")
+    print(f"  votes() one pass:    {one_pass * 1e3:10.3f} ms  ({comprehension / one_pass:,.1f}x faster)")
+    print(f"  set_vote():          {vote * 1e6:10.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Bytes and latency per request of /js/npm scripts: read from disk on every request like before, served from memory
+as is, gzipped, and revalidated with If-None-Match.
+
+Uses htmx from ui/node_modules when it has been installed, and otherwise the Python sources of the app as a stand-in
+script of similar size and compressibility.
+
+    poetry run python -m bench.static [--requests 2000]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+from voting24.web.assets import ui_path
+from voting24.web.static import StaticFiles
+
+_NAME = "htmx.org/dist/htmx.min.js"
+
+
+def _script(root: Path) -> None:
+    path = root / _NAME
+    path.parent.mkdir(parents=True)
+    if (installed := ui_path / "node_modules" / _NAME).exists():
+        path.write_bytes(installed.read_bytes())
+    else:
+        sources = sorted((Path(__file__).parent.parent / "voting24").rglob("*.py"))
+        path.write_text("".join(source.read_text() for source in sources)[:50_000])
+
+
+def _app(root: Path) -> FastAPI:
+    app = FastAPI()
+    scripts = StaticFiles(root, [_NAME], "/js/npm/", "text/javascript")
+
+    @app.get("/before/{script_file:path}.js")
+    def before(script_file: str) -> Response:
+        return Response((root / (script_file + ".js")).read_text(), media_type="text/javascript")
+
+    @app.get("/after/{script_file:path}.js")
+    def after(request: Request, script_file: str) -> Response:
+        return scripts.response(request, script_file + ".js")
+
+    return app
+
+
+async def _measure(client: httpx.AsyncClient, label: str, url: str, headers: dict[str, str], requests: int) -> None:
+    # client time includes decompressing the gzipped responses
+    transferred = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(url, headers=headers)
+        # the body as it was sent, before decompression
+        transferred += response.num_bytes_downloaded
+    elapsed = time.perf_counter() - start
+    print(f"{label:28} {transferred / requests:10,.0f} bytes {elapsed / requests * 1e6:10,.0f} us per request")
+
+
+async def run(requests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _script(root)
+        transport = httpx.ASGITransport(app=_app(root))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            identity = {"Accept-Encoding": "identity"}
+            etag = (await client.get(f"/after/{_NAME}", headers=identity)).headers["etag"]
+            revalidate = identity | {"If-None-Match": etag}
+            await _measure(client, "before", f"/before/{_NAME}", identity, requests)
+            await _measure(client, "after, uncompressed", f"/after/{_NAME}", identity, requests)
+            await _measure(client, "after, gzip", f"/after/{_NAME}", {"Accept-Encoding": "gzip"}, requests)
+            await _measure(client, "after, If-None-Match", f"/after/{_NAME}", revalidate, requests)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from collections.abc import Sequence
+
+import pytest
+
+from voting24.db.async_database import BatchingAsyncDatabase, ThreadedAsyncDatabase
+from voting24.db.database import (
+    Database,
+    DatabaseError,
+    GameNotFoundError,
+    InMemoryDatabase,
+    PlayerNotFoundError,
+    Vote,
+)
+from voting24.game.game import Choice, Game, VoteItem
+
+
+class _BlockingDatabase(InMemoryDatabase):
+    blocking = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.threads: set[int] = set()
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def load_game(self, key: str) -> Game:
+        with self._lock:
+            self.threads.add(threading.get_ident())
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self._lock:
+            self.running -= 1
+        return super().load_game(key)
+
+
+def threaded_async_database_should_run_blocking_calls_in_worker_threads() -> None:
+    database = _BlockingDatabase()
+    database.save_game(Game.new(name="game"))
+
+    async def load() -> Game:
+        return await ThreadedAsyncDatabase(database).load_game("game")
+
+    assert asyncio.run(load()).key == "game"
+    assert threading.get_ident() not in database.threads
+
+
+def threaded_async_database_should_limit_concurrent_calls() -> None:
+    database = _BlockingDatabase()
+    database.save_game(Game.new(name="game"))
+    async_database = ThreadedAsyncDatabase(database, max_concurrency=3)
+
+    async def load_many() -> None:
+        await asyncio.gather(*(async_database.load_game("game") for _ in range(20)))
+
+    asyncio.run(load_many())
+    assert database.max_running <= 3
+
+
+def threaded_async_database_should_call_non_blocking_databases_directly() -> None:
+    database = InMemoryDatabase()
+    async_database = ThreadedAsyncDatabase(database)
+
+    async def save_and_join() -> int:
+        await async_database.save_game(Game.new(name="game"))
+        await async_database.join_game("game", "player")
+        return threading.get_ident()
+
+    assert asyncio.run(save_and_join()) == threading.get_ident()
+    assert database.load_game("game").player("player")
+
+
+class _SlowWritesDatabase(_BlockingDatabase):
+    def __init__(self) -> None:
+        super().__init__()
+        self.writing = 0
+        self.released = threading.Event()
+
+    def vote_many(self, game_key: str, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        with self._lock:
+            self.writing += 1
+        self.released.wait(5)
+        return super().vote_many(game_key, votes)
+
+
+def threaded_async_database_should_not_keep_reads_waiting_for_writes() -> None:
+    database = _SlowWritesDatabase()
+    _game_with_players(database, 4)
+    async_database = ThreadedAsyncDatabase(database, max_concurrency=2, max_write_concurrency=1)
+
+    async def read_while_writing() -> tuple[Game, int]:
+        votes = [asyncio.create_task(async_database.vote(f"player {i}", "game", "item", "choice")) for i in range(4)]
+        await asyncio.sleep(0.05)
+        game = await asyncio.wait_for(async_database.load_game("game"), 1)
+        writing = database.writing
+        database.released.set()
+        await asyncio.gather(*votes)
+        return game, writing
+
+    game, writing = asyncio.run(read_while_writing())
+    assert game.key == "game"
+    assert writing == 1
+    assert {result.item.key: result.score for result in database.results("game")} == {"item": 4}
+
+
+class _CountingDatabase(InMemoryDatabase):
+    def __init__(self) -> None:
+        super().__init__()
+        self.batches: list[int] = []
+
+    def vote_many(self, game_key: str, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        self.batches.append(len(votes))
+        return super().vote_many(game_key, votes)
+
+
+def _game_with_players(database: Database, players: int) -> Game:
+    game = Game.new(name="game")
+    game.items = [VoteItem(key="item", title="Item", text="", options=[Choice(key="choice", text="Choice", value=1)])]
+    database.save_game(game)
+    for i in range(players):
+        database.join_game(game.key, f"player {i}")
+    return game
+
+
+def batching_async_database_should_write_concurrent_votes_together() -> None:
+    database = _CountingDatabase()
+    _game_with_players(database, 10)
+    async_database = BatchingAsyncDatabase(ThreadedAsyncDatabase(database), window=0.01)
+
+    async def vote_all() -> None:
+        await asyncio.gather(*(async_database.vote(f"player {i}", "game", "item", "choice") for i in range(10)))
+
+    asyncio.run(vote_all())
+    assert database.batches == [10]
+    assert {result.item.key: result.score for result in database.results("game")} == {"item": 10}
+
+
+def batching_async_database_should_raise_the_error_of_a_single_vote() -> None:
+    database = _CountingDatabase()
+    _game_with_players(database, 1)
+    async_database = BatchingAsyncDatabase(ThreadedAsyncDatabase(database), window=0.01)
+
+    async def vote_both() -> tuple[BaseException | None, BaseException | None]:
+        return await asyncio.gather(
+            async_database.vote("player 0", "game", "item", "choice"),
+            async_database.vote("unknown", "game", "item", "choice"),
+            return_exceptions=True,
+        )
+
+    result = asyncio.run(vote_both())
+    assert result[0] is None
+    assert isinstance(result[1], PlayerNotFoundError)
+    assert database.batches == [2]
+
+
+def batching_async_database_should_fail_all_votes_of_a_missing_game() -> None:
+    async_database = BatchingAsyncDatabase(ThreadedAsyncDatabase(InMemoryDatabase()), window=0.01)
+
+    async def vote() -> None:
+        await async_database.vote("player", "game", "item", "choice")
+
+    with pytest.raises(GameNotFoundError):
+        asyncio.run(vote())
+
+
+def batching_async_database_close_should_write_the_pending_votes() -> None:
+    database = _CountingDatabase()
+    _game_with_players(database, 1)
+    async_database = BatchingAsyncDatabase(ThreadedAsyncDatabase(database), window=0.05)
+
+    async def vote_and_close() -> None:
+        vote = asyncio.get_running_loop().create_task(async_database.vote("player 0", "game", "item", "choice"))
+        await asyncio.sleep(0)
+        await async_database.close()
+        assert vote.done()
+
+    asyncio.run(vote_and_close())
+    assert {result.item.key: result.score for result in database.results("game")} == {"item": 1}
@@ -0,0 +1,76 @@
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from voting24.db.database import Database, InMemoryDatabase, PlayerAlreadyExistsError
+from voting24.db.file_database import FileDatabase
+from voting24.db.sqlite_database import SqliteDatabase
+from voting24.game.game import Choice, Game, VoteItem
+
+_THREADS = 8
+_PLAYERS_PER_THREAD = 10
+
+_backends: dict[str, Callable[[Path], Database]] = {
+    "memory": lambda _: InMemoryDatabase(),
+    "file": FileDatabase,
+    "file journal": lambda path: FileDatabase(path, journal=True, compact_after=50),
+    "sqlite": lambda path: SqliteDatabase(path / "voting.db"),
+}
+
+
+@pytest.fixture(params=_backends)
+def database(request: pytest.FixtureRequest, tmp_path: Path) -> Database:
+    database = _backends[request.param](tmp_path)
+    for key in ("game1", "game2"):
+        game = Game.new(name=key)
+        game.items = [
+            VoteItem(key=f"key{i}", title=f"Vote item {i}", text="", options=[
+                Choice(key="choicekey1", text="Choice A", value=1),
+                Choice(key="choicekey2", text="Choice B", value=2),
+            ])
+            for i in range(3)
+        ]
+        database.save_game(game)
+    return database
+
+
+def _play(database: Database, game_key: str, thread: int) -> None:
+    for p in range(_PLAYERS_PER_THREAD):
+        player_name = f"player {thread}-{p}"
+        database.join_game(game_key, player_name)
+        for i in range(3):
+            database.vote(player_name, game_key, f"key{i}", "choicekey1")
+            database.vote(player_name, game_key, f"key{i}", "choicekey2")
+
+
+def concurrent_joins_and_votes_should_not_be_lost(database: Database) -> None:
+    with ThreadPoolExecutor(_THREADS) as pool:
+        futures = [pool.submit(_play, database, f"game{t % 2 + 1}", t) for t in range(_THREADS)]
+    for future in futures:
+        future.result()
+
+    players = _THREADS // 2 * _PLAYERS_PER_THREAD
+    for key in ("game1", "game2"):
+        assert len(database.load_game(key).players) == players
+        points = {result.item.key: result.score for result in database.results(key)}
+        assert points == {f"key{i}": 2 * players for i in range(3)}
+
+
+def concurrent_joins_with_the_same_name_should_let_only_one_in(database: Database) -> None:
+    barrier = threading.Barrier(_THREADS)
+
+    def join() -> bool:
+        barrier.wait()
+        try:
+            database.join_game("game1", "player")
+        except PlayerAlreadyExistsError:
+            return False
+        return True
+
+    with ThreadPoolExecutor(_THREADS) as pool:
+        joined = list(pool.map(lambda _: join(), range(_THREADS)))
+    assert joined.count(True) == 1
+    assert len(database.load_game("game1").players) == 1
@@ -0,0 +1,277 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from voting24.db.database import ChoiceNotFoundError, GameNotFoundError, PlayerAlreadyExistsError, PlayerNotFoundError
+from voting24.db.file_database import FileDatabase
+from voting24.game.game import Choice, Game, Player, VoteItem
+from voting24.metrics import metrics
+
+
+def _game() -> Game:
+    game = Game.new(name="game")
+    game.items = [
+        VoteItem(key="key1", title="Vote item 1", text="", options=[
+            Choice(key="choicekey1", text="Choice A", value=1),
+            Choice(key="choicekey2", text="Choice B", value=2),
+        ]),
+        VoteItem(key="key2", title="Vote item 2", text="", options=[
+            Choice(key="choicekey1", text="Choice A", value=1),
+            Choice(key="choicekey2", text="Choice B", value=2),
+        ]),
+    ]
+    return game
+
+
+@pytest.fixture()
+def database(tmp_path: Path) -> FileDatabase:
+    database = FileDatabase(tmp_path)
+    database.save_game(_game())
+    return database
+
+
+@pytest.fixture()
+def journal_database(tmp_path: Path) -> FileDatabase:
+    database = FileDatabase(tmp_path, journal=True, compact_after=1_000_000)
+    database.save_game(_game())
+    return database
+
+
+def load_game_should_include_joined_players_and_votes(database: FileDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey2")
+    game = database.load_game("game")
+    player = game.player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey2"}
+    assert game.points() == {game.items[0]: 2, game.items[1]: 0}
+
+
+def join_game_should_not_allow_existing_player(database: FileDatabase) -> None:
+    database.join_game("game", "player")
+    with pytest.raises(PlayerAlreadyExistsError):
+        database.join_game("game", "player")
+
+
+def join_game_as_existing_should_keep_votes(database: FileDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey2")
+    player = database.join_game("game", "player", join_as_existing=True)
+    assert player.votes == {"key1": "choicekey2"}
+
+
+def journal_vote_should_append_to_log_instead_of_rewriting_player(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    journal_database.vote("player", "game", "key1", "choicekey1")
+    assert (journal_database.path / "game" / "player.json").read_text() == '{"name":"player","votes":{}}'
+    assert (journal_database.path / "game.votes.log").read_text().splitlines() == [
+        '["player","key1","choicekey2"]',
+        '["player","key1","choicekey1"]',
+    ]
+
+
+def journal_load_game_should_replay_votes(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    journal_database.vote("player", "game", "key2", "choicekey2")
+    journal_database.vote("player", "game", "key1", "choicekey1")
+    game = journal_database.load_game("game")
+    player = game.player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey1", "key2": "choicekey2"}
+    assert game.points() == {game.items[0]: 1, game.items[1]: 2}
+
+
+def journal_load_game_should_skip_a_truncated_record(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    with (journal_database.path / "game.votes.log").open("a") as log:
+        log.write('["player","key2","choi')
+    player = journal_database.load_game("game").player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey2"}
+
+
+def journal_compact_should_fold_log_into_player_files(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    journal_database.compact("game")
+    assert not (journal_database.path / "game.votes.log").exists()
+    assert not (journal_database.path / "game.votes.log.compacting").exists()
+    player = FileDatabase(journal_database.path).load_game("game").player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey2"}
+
+
+def journal_compact_should_keep_the_cached_game(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    game = journal_database.load_game("game")
+    journal_database.compact("game")
+    misses = metrics.counter("file_database.game_cache.misses").value
+    assert journal_database.load_game("game") is game
+    assert metrics.counter("file_database.game_cache.misses").value == misses
+    assert not list(journal_database.path.glob(".*.tmp"))
+
+
+def journal_load_game_should_replay_an_interrupted_compaction_before_the_log(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    (journal_database.path / "game.votes.log").replace(journal_database.path / "game.votes.log.compacting")
+    journal_database.vote("player", "game", "key1", "choicekey1")
+    player = journal_database.load_game("game").player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey1"}
+
+
+def load_game_should_return_the_cached_game_when_nothing_has_changed(database: FileDatabase) -> None:
+    database.join_game("game", "player")
+    hits = metrics.counter("file_database.game_cache.hits").value
+    assert database.load_game("game") is database.load_game("game")
+    assert metrics.counter("file_database.game_cache.hits").value >= hits + 1
+
+
+def load_game_should_keep_the_cached_game_up_to_date_with_own_writes(database: FileDatabase) -> None:
+    game = database.load_game("game")
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey2")
+    assert database.load_game("game") is game
+    assert game.points() == {game.items[0]: 2, game.items[1]: 0}
+
+
+def load_game_should_notice_writes_from_other_instances(database: FileDatabase) -> None:
+    database.join_game("game", "player")
+    # make sure the other write lands on a later mtime tick than the cached one
+    os.utime(database.path / "game", ns=(0, 0))
+    database.load_game("game")
+    other = FileDatabase(database.path)
+    other.vote("player", "game", "key1", "choicekey2")
+    player = database.load_game("game").player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey2"}
+
+
+def load_game_should_notice_journaled_writes_from_other_instances(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.load_game("game")
+    other = FileDatabase(journal_database.path, journal=True)
+    other.vote("player", "game", "key1", "choicekey2")
+    player = journal_database.load_game("game").player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey2"}
+
+
+def load_game_should_not_return_a_cached_game_that_was_deleted(database: FileDatabase) -> None:
+    database.load_game("game")
+    (database.path / "game.json").unlink()
+    with pytest.raises(GameNotFoundError):
+        database.load_game("game")
+
+
+def game_version_should_increase_on_every_change(journal_database: FileDatabase) -> None:
+    versions = [journal_database.game_version("game")]
+    journal_database.join_game("game", "player")
+    versions.append(journal_database.game_version("game"))
+    journal_database.vote("player", "game", "key1", "choicekey1")
+    versions.append(journal_database.game_version("game"))
+    journal_database.save_game(journal_database.load_game("game"))
+    versions.append(journal_database.game_version("game"))
+    assert versions == sorted(set(versions))
+
+
+def journal_vote_should_not_rewrite_the_version_file(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    version_file = journal_database.path / "game.version"
+    written = version_file.stat().st_mtime_ns, version_file.stat().st_ino
+    version = journal_database.game_version("game")
+    journal_database.vote("player", "game", "key1", "choicekey1")
+    assert (version_file.stat().st_mtime_ns, version_file.stat().st_ino) == written
+    assert journal_database.game_version("game") > version
+
+
+def journal_compact_should_keep_the_game_version(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey1")
+    version = journal_database.game_version("game")
+    journal_database.compact("game")
+    assert journal_database.game_version("game") == version
+    assert FileDatabase(journal_database.path).game_version("game") == version
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    assert journal_database.game_version("game") > version
+
+
+def game_version_should_be_shared_between_instances(database: FileDatabase) -> None:
+    database.join_game("game", "player")
+    assert FileDatabase(database.path).game_version("game") == database.game_version("game")
+
+
+def game_version_should_raise_if_game_does_not_exist(database: FileDatabase) -> None:
+    with pytest.raises(GameNotFoundError):
+        database.game_version("unknown")
+
+
+def journal_vote_many_should_append_all_votes_at_once(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player 1")
+    journal_database.join_game("game", "player 2")
+    errors = journal_database.vote_many("game", [
+        ("player 1", "key1", "choicekey1"),
+        ("player 2", "key1", "unknown"),
+        ("player 2", "key1", "choicekey2"),
+    ])
+    assert [type(error) for error in errors] == [type(None), ChoiceNotFoundError, type(None)]
+    assert len((journal_database.path / "game.votes.log").read_text().splitlines()) == 2
+    game = FileDatabase(journal_database.path, journal=True).load_game("game")
+    assert game.points() == {game.items[0]: 3, game.items[1]: 0}
+
+
+def load_game_metadata_should_not_read_players(database: FileDatabase) -> None:
+    database.join_game("game", "player")
+    (database.path / "game" / "player.json").write_text("not json")
+    assert [item.key for item in FileDatabase(database.path).load_game_metadata("game").items] == ["key1", "key2"]
+
+
+def load_player_should_read_only_that_player(journal_database: FileDatabase) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.join_game("game", "other")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    (journal_database.path / "game" / "other.json").write_text("not json")
+    player = FileDatabase(journal_database.path, journal=True).load_player("game", "player")
+    assert player.votes == {"key1": "choicekey2"}
+
+
+def load_player_should_not_lose_votes_to_a_compaction(
+    journal_database: FileDatabase,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    journal_database.join_game("game", "player")
+    journal_database.vote("player", "game", "key1", "choicekey2")
+    (journal_database.path / "game.votes.log").replace(journal_database.path / "game.votes.log.compacting")
+    reader = FileDatabase(journal_database.path, journal=True)
+    read = Player.from_trusted_json
+
+    def compact_after_reading(data: bytes) -> Player:
+        # the player file has been read, the compaction folds the log into it and removes the log
+        monkeypatch.undo()
+        player = read(data)
+        journal_database.compact("game")
+        return player
+
+    monkeypatch.setattr(Player, "from_trusted_json", compact_after_reading)
+    assert reader.load_player("game", "player").votes == {"key1": "choicekey2"}
+
+
+def load_player_should_raise_if_player_is_not_found(database: FileDatabase) -> None:
+    with pytest.raises(PlayerNotFoundError):
+        database.load_player("game", "player")
+
+
+def game_keys_should_list_the_last_changed_game_first(database: FileDatabase) -> None:
+    other = _game()
+    other.key = "other"
+    database.save_game(other)
+    assert database.game_keys() == ["other", "game"]
+    database.join_game("game", "player")
+    os.utime(database.path / "game.version", ns=(2**62, 2**62))
+    assert database.game_keys() == ["game", "other"]
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+
+from voting24.db.file_database import FileDatabase
+from voting24.db.identity_map import request_scope
+from voting24.db.sqlite_database import SqliteDatabase
+from voting24.game.game import Choice, Game, VoteItem
+
+
+def _game() -> Game:
+    game = Game.new(name="game")
+    game.items = [
+        VoteItem(key="key1", title="Vote item 1", text="", options=[
+            Choice(key="choicekey1", text="Choice A", value=1),
+            Choice(key="choicekey2", text="Choice B", value=2),
+        ]),
+    ]
+    return game
+
+
+@pytest.fixture()
+def sqlite_database(tmp_path: Path) -> SqliteDatabase:
+    database = SqliteDatabase(tmp_path / "voting.db")
+    database.save_game(_game())
+    database.join_game("game", "player")
+    return database
+
+
+def sqlite_database_should_load_a_game_once_per_request(sqlite_database: SqliteDatabase) -> None:
+    with request_scope():
+        game = sqlite_database.load_game("game")
+        assert sqlite_database.load_game("game") is game
+        assert sqlite_database.load_game_metadata("game") is game
+        assert sqlite_database.load_player("game", "player") is game.player("player")
+    assert sqlite_database.load_game("game") is not sqlite_database.load_game("game")
+
+
+def sqlite_database_should_apply_writes_to_the_loaded_game(sqlite_database: SqliteDatabase) -> None:
+    with request_scope():
+        game = sqlite_database.load_game("game")
+        sqlite_database.join_game("game", "other")
+        sqlite_database.vote("other", "game", "key1", "choicekey2")
+        assert sqlite_database.load_game("game") is game
+        assert game.points() == {game.items[0]: 2}
+    assert {result.item.key: result.score for result in sqlite_database.results("game")} == {"key1": 2}
+
+
+def sqlite_database_should_not_use_the_identity_map_of_another_database(
+    sqlite_database: SqliteDatabase,
+    tmp_path: Path,
+) -> None:
+    other = SqliteDatabase(tmp_path / "other.db")
+    other.save_game(_game())
+    with request_scope():
+        assert sqlite_database.load_game("game").players
+        assert not other.load_game("game").players
+
+
+def file_database_should_check_the_files_once_per_request(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    database = FileDatabase(tmp_path)
+    database.save_game(_game())
+    with request_scope():
+        game = database.load_game("game")
+        monkeypatch.setattr(database, "_cache_token", lambda key: pytest.fail("files checked again"))
+        assert database.load_game("game") is game
+        assert database.load_game_metadata("game") is game
@@ -0,0 +1,78 @@
+import pytest
+
+from voting24.db.database import (
+    InMemoryDatabase,
+    PlayerAlreadyExistsError,
+    PlayerNotFoundError,
+    VoteItemNotFoundError,
+)
+from voting24.game.game import Choice, Game, VoteItem
+
+
+@pytest.fixture()
+def database() -> InMemoryDatabase:
+    game = Game.new(name="game")
+    game.items = [
+        VoteItem(key="key1", title="Vote item 1", text="", options=[
+            Choice(key="choicekey1", text="Choice A", value=1),
+            Choice(key="choicekey2", text="Choice B", value=2),
+        ]),
+    ]
+    return InMemoryDatabase(games={game.key: game})
+
+
+def join_game_should_add_player(database: InMemoryDatabase) -> None:
+    player = database.join_game("game", "player")
+    assert database.load_game("game").player("player") is player
+
+
+def join_game_should_not_allow_existing_player(database: InMemoryDatabase) -> None:
+    database.join_game("game", "player")
+    with pytest.raises(PlayerAlreadyExistsError):
+        database.join_game("game", "player")
+
+
+def join_game_as_existing_should_keep_the_existing_player(database: InMemoryDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey1")
+    player = database.join_game("game", "player", join_as_existing=True)
+    game = database.load_game("game")
+    assert player.votes == {"key1": "choicekey1"}
+    assert len(game.players) == 1
+
+
+def vote_should_raise_if_player_is_not_found(database: InMemoryDatabase) -> None:
+    with pytest.raises(PlayerNotFoundError):
+        database.vote("player", "game", "key1", "choicekey1")
+
+
+def vote_should_update_points(database: InMemoryDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey1")
+    database.vote("player", "game", "key1", "choicekey2")
+    game = database.load_game("game")
+    assert game.points() == {game.items[0]: 2}
+
+
+def game_version_should_increase_on_every_change(database: InMemoryDatabase) -> None:
+    versions = [database.game_version("game")]
+    database.join_game("game", "player")
+    versions.append(database.game_version("game"))
+    database.vote("player", "game", "key1", "choicekey1")
+    versions.append(database.game_version("game"))
+    database.save_game(database.load_game("game"))
+    versions.append(database.game_version("game"))
+    assert versions == sorted(set(versions))
+
+
+def vote_many_should_apply_the_batch_as_one_change(database: InMemoryDatabase) -> None:
+    database.join_game("game", "player")
+    version = database.game_version("game")
+    errors = database.vote_many("game", [
+        ("player", "key1", "choicekey2"),
+        ("unknown", "key1", "choicekey1"),
+        ("player", "unknown", "choicekey1"),
+    ])
+    assert [type(error) for error in errors] == [type(None), PlayerNotFoundError, VoteItemNotFoundError]
+    assert {result.item.key: result.score for result in database.results("game")} == {"key1": 2}
+    assert database.game_version("game") == version + 1
@@ -0,0 +1,215 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from voting24.db.database import (
+    ChoiceNotFoundError,
+    GameNotFoundError,
+    PlayerAlreadyExistsError,
+    PlayerNotFoundError,
+    VoteItemNotFoundError,
+)
+from voting24.db.sqlite_database import SqliteDatabase
+from voting24.game.game import Choice, Game, Player, VoteItem
+
+
+@pytest.fixture()
+def database(tmp_path: Path) -> SqliteDatabase:
+    database = SqliteDatabase(tmp_path / "voting.db")
+    game = Game.new(name="game")
+    game.items = [
+        VoteItem(key="key1", icon="👍", title="Vote item 1", text="", options=[
+            Choice(key="choicekey1", text="Choice A", value=1),
+            Choice(key="choicekey2", text="Choice B", value=2),
+        ]),
+        VoteItem(key="key2", title="Vote item 2", text="", image_url="https://example.com/2.png", options=[
+            Choice(key="choicekey1", text="Choice A", value=1),
+            Choice(key="choicekey2", text="Choice B", value=2),
+        ]),
+    ]
+    database.save_game(game)
+    return database
+
+
+def load_game_should_return_the_saved_game(database: SqliteDatabase) -> None:
+    game = database.load_game("game")
+    assert game.name == "game"
+    assert [item.key for item in game.items] == ["key1", "key2"]
+    assert game.items[0].icon == "👍"
+    assert game.items[1].image_url == "https://example.com/2.png"
+    assert [choice.key for choice in game.items[1].options] == ["choicekey1", "choicekey2"]
+
+
+def load_game_should_raise_if_game_does_not_exist(database: SqliteDatabase) -> None:
+    with pytest.raises(GameNotFoundError):
+        database.load_game("unknown")
+
+
+def load_game_should_include_joined_players_and_votes(database: SqliteDatabase) -> None:
+    database.join_game("game", "player 1")
+    database.join_game("game", "player 2")
+    database.vote("player 1", "game", "key1", "choicekey2")
+    game = database.load_game("game")
+    assert [player.name for player in game.players] == ["player 1", "player 2"]
+    assert game.players[0].votes == {"key1": "choicekey2"}
+
+
+def join_game_should_not_allow_existing_player(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    with pytest.raises(PlayerAlreadyExistsError):
+        database.join_game("game", "player")
+
+
+def join_game_as_existing_should_return_the_existing_player(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey2")
+    assert database.join_game("game", "player", join_as_existing=True) == Player(
+        name="player",
+        votes={"key1": "choicekey2"},
+    )
+
+
+def join_game_should_raise_if_game_does_not_exist(database: SqliteDatabase) -> None:
+    with pytest.raises(GameNotFoundError):
+        database.join_game("unknown", "player")
+
+
+def vote_should_replace_the_previous_vote(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey2")
+    database.vote("player", "game", "key1", "choicekey1")
+    player = database.load_game("game").player("player")
+    assert player
+    assert player.votes == {"key1": "choicekey1"}
+
+
+def vote_should_raise_if_player_is_not_found(database: SqliteDatabase) -> None:
+    with pytest.raises(PlayerNotFoundError):
+        database.vote("player", "game", "key1", "choicekey1")
+
+
+def vote_should_raise_if_item_is_not_found(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    with pytest.raises(VoteItemNotFoundError):
+        database.vote("player", "game", "unknown", "choicekey1")
+
+
+def vote_should_raise_if_choice_is_not_found(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    with pytest.raises(ChoiceNotFoundError):
+        database.vote("player", "game", "key1", "unknown")
+
+
+def results_should_be_counted_without_loading_the_players(
+    database: SqliteDatabase,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    database.join_game("game", "player 1")
+    database.join_game("game", "player 2")
+    database.vote("player 1", "game", "key1", "choicekey2")
+    database.vote("player 2", "game", "key1", "choicekey1")
+    database.vote("player 2", "game", "key2", "choicekey1")
+    expected = database.load_game("game").results()
+    monkeypatch.setattr(database, "load_game", None)
+    results = database.results("game")
+    assert [(result.item.key, result.score, result.count, result.rank) for result in results] == [
+        ("key1", 3, 2, 1),
+        ("key2", 1, 1, 2),
+    ]
+    assert results[0].histogram == {"choicekey1": 1, "choicekey2": 1}
+    assert results == expected
+
+
+def results_should_not_count_votes_for_removed_choices(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey2")
+    game = database.load_game("game")
+    game.items[0].options = game.items[0].options[:1]
+    database.save_game(game)
+    assert database.results("game")[0].histogram == {"choicekey1": 0}
+    assert database.results("game")[0].score == 0
+
+
+def load_game_metadata_should_see_games_saved_by_other_connections(database: SqliteDatabase) -> None:
+    assert database.load_game_metadata("game").name == "game"
+    other = SqliteDatabase(database.path)
+    game = other.load_game("game")
+    game.name = "renamed"
+    other.save_game(game)
+    other.close()
+    assert database.load_game_metadata("game").name == "renamed"
+
+
+def save_game_should_keep_existing_votes(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    database.vote("player", "game", "key1", "choicekey2")
+    game = database.load_game("game")
+    game.name = "renamed"
+    database.save_game(game)
+    assert {result.item.key: result.score for result in database.results("game")} == {"key1": 2, "key2": 0}
+    assert database.load_game("game").name == "renamed"
+
+
+def game_version_should_increase_on_every_change(database: SqliteDatabase) -> None:
+    versions = [database.game_version("game")]
+    database.join_game("game", "player")
+    versions.append(database.game_version("game"))
+    database.vote("player", "game", "key1", "choicekey1")
+    versions.append(database.game_version("game"))
+    database.save_game(database.load_game("game"))
+    versions.append(database.game_version("game"))
+    assert versions == sorted(set(versions))
+
+
+def game_version_should_not_change_on_a_failed_vote(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    version = database.game_version("game")
+    with pytest.raises(ChoiceNotFoundError):
+        database.vote("player", "game", "key1", "unknown")
+    assert database.game_version("game") == version
+
+
+def game_version_should_raise_if_game_does_not_exist(database: SqliteDatabase) -> None:
+    with pytest.raises(GameNotFoundError):
+        database.game_version("unknown")
+
+
+def vote_many_should_report_errors_per_vote(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    errors = database.vote_many("game", [
+        ("player", "key1", "choicekey2"),
+        ("unknown", "key1", "choicekey1"),
+        ("player", "unknown", "choicekey1"),
+    ])
+    assert [type(error) for error in errors] == [type(None), PlayerNotFoundError, VoteItemNotFoundError]
+    assert {result.item.key: result.score for result in database.results("game")} == {"key1": 2, "key2": 0}
+
+
+def load_game_metadata_should_return_the_items(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    metadata = database.load_game_metadata("game")
+    assert [item.key for item in metadata.items] == ["key1", "key2"]
+    assert not hasattr(metadata, "players")
+
+
+def load_player_should_return_the_votes_of_one_player(database: SqliteDatabase) -> None:
+    database.join_game("game", "player")
+    database.join_game("game", "other")
+    database.vote("player", "game", "key1", "choicekey2")
+    assert database.load_player("game", "player") == Player(name="player", votes={"key1": "choicekey2"})
+    with pytest.raises(PlayerNotFoundError):
+        database.load_player("game", "unknown")
+
+
+def close_should_close_the_connections_of_all_threads(database: SqliteDatabase) -> None:
+    thread = threading.Thread(target=database.load_game, args=("game",))
+    thread.start()
+    thread.join()
+    connections = list(database._connections)  # noqa: SLF001
+    assert len(connections) == 2
+    database.close()
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
@@ -258,3 +258,207 @@ def game_next_item_should_the_next_item() -> None:
         players=[],
     )
     assert game.next_item(game.items[0]) == game.items[1]
+
+
+def game_set_vote_should_update_points() -> None:
+    game = Game(
+        key="key",
+        name="name",
+        items=[
+            VoteItem(key="itemkey", title="text", text="text", options=[
+                Choice(key="choicekey1", text="text", value=1),
+                Choice(key="choicekey2", text="text", value=2),
+            ]),
+        ],
+        players=[
+            Player(name="name 1", votes={"itemkey": "choicekey1"}),
+            Player(name="name 2", votes={}),
+        ],
+    )
+    game.set_vote(game.players[1], "itemkey", "choicekey2")
+    assert game.points() == {game.items[0]: 3}
+    assert game.players[1].votes == {"itemkey": "choicekey2"}
+
+
+def game_set_vote_should_replace_previous_vote_in_tally() -> None:
+    game = Game(
+        key="key",
+        name="name",
+        items=[
+            VoteItem(key="itemkey", title="text", text="text", options=[
+                Choice(key="choicekey1", text="text", value=1),
+                Choice(key="choicekey2", text="text", value=2),
+            ]),
+        ],
+        players=[
+            Player(name="name 1", votes={"itemkey": "choicekey1"}),
+        ],
+    )
+    game.set_vote(game.players[0], "itemkey", "choicekey2")
+    tally = game.tally()[game.items[0]]
+    assert tally.score == 2
+    assert tally.count == 1
+    assert tally.choices == {"choicekey1": 0, "choicekey2": 1}
+
+
+def game_tally_should_be_rebuilt_when_players_are_assigned() -> None:
+    game = Game(
+        key="key",
+        name="name",
+        items=[
+            VoteItem(key="itemkey", title="text", text="text", options=[
+                Choice(key="choicekey1", text="text", value=1),
+                Choice(key="choicekey2", text="text", value=2),
+            ]),
+        ],
+        players=[],
+    )
+    game.players = [
+        Player(name="name 1", votes={"itemkey": "choicekey1"}),
+        Player(name="name 2", votes={"itemkey": "choicekey2"}),
+    ]
+    tally = game.tally()[game.items[0]]
+    assert tally.score == 3
+    assert tally.count == 2
+    assert tally.choices == {"choicekey1": 1, "choicekey2": 1}
+
+
+def game_player_should_be_found_by_name() -> None:
+    game = Game.new(name="name")
+    game.players = [Player.new("name 1"), Player.new("name 2")]
+    assert game.player("name 2") is game.players[1]
+    assert game.player("name 3") is None
+
+
+def game_player_should_be_found_after_deserialization() -> None:
+    game = Game.new(name="name")
+    game.players = [Player(name="name 1", votes={"itemkey": "choicekey1"})]
+    loaded = Game.model_validate_json(game.model_dump_json())
+    player = loaded.player("name 1")
+    assert player is loaded.players[0]
+    assert player.votes == {"itemkey": "choicekey1"}
+
+
+def game_add_player_should_make_player_findable() -> None:
+    game = Game.new(name="name")
+    player = Player.new("name 1")
+    game.add_player(player)
+    assert game.players == [player]
+    assert game.player("name 1") is player
+
+
+def game_add_player_should_not_allow_duplicate_names() -> None:
+    game = Game.new(name="name")
+    game.add_player(Player.new("name 1"))
+    with pytest.raises(ValueError, match="already in game"):
+        game.add_player(Player.new("name 1"))
+
+
+def game_item_should_be_found_by_key() -> None:
+    game = Game.new(name="name")
+    game.items = [
+        VoteItem(key="itemkey", title="text", text="text", options=[]),
+        VoteItem(key="itemkey2", title="text", text="text", options=[]),
+    ]
+    assert game.item("itemkey2") is game.items[1]
+    assert game.item("itemkey3") is None
+
+
+def game_is_last_item_should_be_true_only_for_the_last_item() -> None:
+    game = Game.new(name="name")
+    game.items = [
+        VoteItem(key="itemkey", title="text", text="text", options=[]),
+        VoteItem(key="itemkey2", title="text", text="text", options=[]),
+    ]
+    assert not game.is_last_item(game.items[0])
+    assert game.is_last_item(game.items[1])
+
+
+def vote_item_choice_should_be_found_by_key() -> None:
+    vote_item = VoteItem(key="key", title="text", text="text", options=[
+        Choice(key="choicekey1", text="text", value=1),
+        Choice(key="choicekey2", text="text", value=2),
+    ])
+    assert vote_item.choice("choicekey2") == Choice(key="choicekey2", text="text", value=2)
+    assert vote_item.choice("choicekey3") is None
+
+
+def vote_item_choice_should_be_found_after_options_are_assigned() -> None:
+    vote_item = VoteItem(key="key", title="text", text="text", options=[])
+    vote_item.options = [Choice(key="choicekey1", text="text", value=1)]
+    choice = vote_item.choice("choicekey1")
+    assert choice
+    assert choice.value == 1
+
+
+def game_from_trusted_json_should_equal_the_validated_game() -> None:
+    game = Game.new(name="name")
+    game.items = [
+        VoteItem(key="key1", title="text", text="text", options=[Choice(key="a", text="A", value=1)]),
+        VoteItem(key="key2", title="text", text="text", options=[Choice(key="a", text="A", value=3)]),
+    ]
+    game.players = [Player(name="player", votes={"key1": "a", "key2": "a"}), Player(name="other", votes={})]
+    data = game.model_dump_json()
+
+    trusted = Game.from_trusted_json(data)
+    assert trusted == Game.model_validate_json(data)
+    assert {item.key: points for item, points in trusted.points().items()} == {"key1": 1, "key2": 3}
+    assert trusted.player("player") == game.player("player")
+    assert trusted.items[0].choice("a") == Choice(key="a", text="A", value=1)
+    assert trusted.next_item(trusted.items[0]) == trusted.items[1]
+
+
+def game_from_trusted_should_not_validate() -> None:
+    game = Game.from_trusted({"key": "Not a key", "name": "name", "items": [], "players": []})
+    assert game.key == "Not a key"
+
+
+def game_results_should_summarize_every_item_from_the_tallies() -> None:
+    choices = [Choice(key="down", text="text", value=-1), Choice(key="up", text="text", value=2)]
+    game = Game(
+        key="key",
+        name="name",
+        items=[
+            VoteItem(key="itemkey", title="text", text="text", options=choices),
+            VoteItem(key="itemkey2", title="text", text="text", options=choices),
+            VoteItem(key="itemkey3", title="text", text="text", options=choices),
+        ],
+        players=[
+            Player(name="name 1", votes={"itemkey": "up", "itemkey2": "up"}),
+            Player(name="name 2", votes={"itemkey": "down", "itemkey2": "down", "itemkey3": "up"}),
+        ],
+    )
+    results = game.results()
+    assert [result.item for result in results] == game.items
+    assert [result.score for result in results] == [1, 1, 2]
+    assert [result.count for result in results] == [2, 2, 1]
+    assert [result.rank for result in results] == [2, 2, 1]
+    assert results[0].histogram == {"down": 1, "up": 1}
+    assert results[2].histogram == {"down": 0, "up": 1}
+    assert results[0].mean == pytest.approx(0.5)
+
+
+def game_results_should_follow_set_vote() -> None:
+    game = Game(
+        key="key",
+        name="name",
+        items=[VoteItem(key="itemkey", title="text", text="text", options=[Choice(key="a", text="text", value=3)])],
+        players=[Player(name="name 1", votes={})],
+    )
+    assert game.results()[0].mean == 0
+    game.set_vote(game.players[0], "itemkey", "a")
+    assert (game.results()[0].score, game.results()[0].count, game.results()[0].mean) == (3, 1, 3)
+
+
+def game_results_controversy_should_be_highest_when_votes_split_between_the_extremes() -> None:
+    choices = [Choice(key=key, text="text", value=value) for key, value in (("low", -2), ("mid", 0), ("high", 4))]
+    game = Game(
+        key="key",
+        name="name",
+        items=[VoteItem(key="itemkey", title="text", text="text", options=choices)],
+        players=[Player(name="name 1", votes={"itemkey": "high"}), Player(name="name 2", votes={"itemkey": "high"})],
+    )
+    assert game.results()[0].controversy == 0
+    game.set_vote(game.players[1], "itemkey", "low")
+    assert game.results()[0].controversy == pytest.approx(1)
+    assert game.results()[0].variance == pytest.approx(9)
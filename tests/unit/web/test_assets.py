@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.page_objects.base import PageBase
+from voting24.game.game import Game
+from voting24.web import assets
+from voting24.web.assets import CompileCache, CompiledCss, Manifest, build
+
+
+def _compile(file_path: Path) -> CompiledCss:
+    return CompiledCss(f"/* {file_path} */", [])
+
+
+@pytest.fixture()
+def built(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Manifest:
+    (tmp_path / "ui" / "styles").mkdir(parents=True)
+    (tmp_path / "ui" / "styles" / "main.scss").write_text("")
+    (tmp_path / "ui" / "styles" / "_partial.scss").write_text("")
+    build(tmp_path / "ui", tmp_path / "dist", _compile)
+    manifest = Manifest(tmp_path / "dist")
+    monkeypatch.setattr(assets, "manifest", manifest)
+    monkeypatch.delenv("ASSETS_DEV", raising=False)
+    return manifest
+
+
+def build_should_write_hashed_stylesheets_and_skip_partials(built: Manifest) -> None:
+    assert list(built.files) == ["main.css"]
+    file_name = built.files["main.css"]
+    assert file_name.startswith("main.")
+    assert (built.path / "css" / file_name).read_text() == "/* styles/main.scss */"
+
+
+def pages_should_link_to_the_hashed_stylesheet(testclient: TestClient, game: Game, built: Manifest) -> None:
+    page = PageBase(testclient.get(f"/game/{game.key}"))
+    link = page.css.select_one("link[rel=stylesheet]")
+    assert link
+    assert link.attrs["href"] == f"/css/{built.files['main.css']}"
+
+
+def hashed_stylesheet_should_be_cached_forever(testclient: TestClient, built: Manifest) -> None:
+    response = testclient.get(f"/css/{built.files['main.css']}")
+    assert response.status_code == 200
+    assert response.text == "/* styles/main.scss */"
+    assert "immutable" in response.headers["cache-control"]
+
+
+def plain_stylesheet_name_should_serve_the_latest_build(testclient: TestClient, built: Manifest) -> None:
+    response = testclient.get("/css/main.css")
+    assert response.status_code == 200
+    assert response.text == "/* styles/main.scss */"
+    assert response.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.usefixtures("built")
+def unknown_stylesheet_should_not_be_compiled_outside_dev_mode(testclient: TestClient) -> None:
+    assert testclient.get("/css/other.css").status_code == 404
+    assert testclient.get("/css/main.0123456789ab.css").status_code == 404
+
+
+class _CountingCompiler:
+    def __init__(self, source_path: Path) -> None:
+        self.source_path = source_path
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, file_path: Path) -> CompiledCss:
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.05)
+        partial = self.source_path / "styles" / "_partial.scss"
+        return CompiledCss(f"/* {file_path} {partial.read_text()} */", [self.source_path / file_path, partial])
+
+
+@pytest.fixture()
+def sources(tmp_path: Path) -> Path:
+    (tmp_path / "ui" / "styles").mkdir(parents=True)
+    (tmp_path / "ui" / "styles" / "main.scss").write_text("@use 'partial';")
+    (tmp_path / "ui" / "styles" / "_partial.scss").write_text("a")
+    return tmp_path / "ui"
+
+
+def compile_cache_should_compile_once_for_concurrent_requests(sources: Path, tmp_path: Path) -> None:
+    compiler = _CountingCompiler(sources)
+    cache = CompileCache(sources, tmp_path / "cache", compiler)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: cache.get(Path("styles/main.scss")), range(8)))
+    assert compiler.calls == 1
+    assert set(results) == {"/* styles/main.scss a */"}
+
+
+def compile_cache_should_recompile_when_an_imported_file_changes(sources: Path, tmp_path: Path) -> None:
+    compiler = _CountingCompiler(sources)
+    cache = CompileCache(sources, tmp_path / "cache", compiler)
+    cache.get(Path("styles/main.scss"))
+    partial = sources / "styles" / "_partial.scss"
+    partial.write_text("b")
+    os.utime(partial, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+    assert cache.get(Path("styles/main.scss")) == "/* styles/main.scss b */"
+    assert compiler.calls == 2
+
+
+def compile_cache_should_reuse_compiled_stylesheets_from_disk(sources: Path, tmp_path: Path) -> None:
+    CompileCache(sources, tmp_path / "cache", _CountingCompiler(sources)).get(Path("styles/main.scss"))
+    compiler = _CountingCompiler(sources)
+    css = CompileCache(sources, tmp_path / "cache", compiler).get(Path("styles/main.scss"))
+    assert css == "/* styles/main.scss a */"
+    assert compiler.calls == 0
@@ -2,6 +2,7 @@ from fastapi.testclient import TestClient
 
 from tests.page_objects.base import PageBase
 from tests.page_objects.game_results_page import GameResultsPage
+from voting24.db.database import Database
 from voting24.game.game import Game
 
 
@@ -96,3 +97,61 @@ def game_results_htmx_should_add_original_order_to_hx_get_when_asked(
     div = page.css.select_one("#game-results")
     assert div
     assert "original_order=true" in div.attrs["hx-get"]
+
+
+def game_results_page_should_connect_to_results_events(testclient: TestClient, finished_game: Game) -> None:
+    page = GameResultsPage.open(testclient, finished_game.key)
+    assert page.response.status_code == 200
+    container = page.css.select_one("#game-results-container")
+    assert container
+    assert container.attrs["sse-connect"] == f"/game/{finished_game.key}/results/events"
+    results = page.css.select_one("#game-results")
+    assert results
+    assert results.attrs["sse-swap"] == "results"
+    assert results.attrs["hx-get"] == f"/game/{finished_game.key}/results.htmx?live=true"
+    assert results.attrs["hx-trigger"] == "every 10s"
+
+
+def game_results_htmx_should_keep_the_live_results_live(testclient: TestClient, finished_game: Game) -> None:
+    result = testclient.get(f"/game/{finished_game.key}/results.htmx?live=true&original_order=true")
+    assert result.status_code == 200
+    div = PageBase(result).css.select_one("#game-results")
+    assert div
+    assert div.attrs["sse-swap"] == "results"
+    assert div.attrs["hx-get"] == f"/game/{finished_game.key}/results.htmx?live=true&original_order=true"
+    assert div.attrs["hx-trigger"] == "every 10s"
+
+
+def game_results_events_should_return_404_if_game_is_not_found(testclient: TestClient) -> None:
+    result = testclient.get("/game/some-key/results/events")
+    assert result.status_code == 404
+
+
+def game_results_htmx_should_answer_a_matching_etag_with_not_modified(
+    testclient: TestClient,
+    finished_game: Game,
+) -> None:
+    first = testclient.get(f"/game/{finished_game.key}/results.htmx")
+    assert first.headers["etag"]
+    result = testclient.get(f"/game/{finished_game.key}/results.htmx", headers={"If-None-Match": first.headers["etag"]})
+    assert result.status_code == 304
+    assert result.headers["etag"] == first.headers["etag"]
+    assert not result.content
+
+
+def game_results_htmx_should_return_new_results_after_a_vote(
+    testclient: TestClient,
+    database: Database,
+    finished_game: Game,
+) -> None:
+    first = testclient.get(f"/game/{finished_game.key}/results.htmx")
+    database.vote("player 3", finished_game.key, "key1", "choicekey3")
+    result = testclient.get(f"/game/{finished_game.key}/results.htmx", headers={"If-None-Match": first.headers["etag"]})
+    assert result.status_code == 200
+    assert result.headers["etag"] != first.headers["etag"]
+
+
+def game_results_page_should_match_weak_and_listed_etags(testclient: TestClient, finished_game: Game) -> None:
+    etag = testclient.get(f"/game/{finished_game.key}/results").headers["etag"]
+    result = testclient.get(f"/game/{finished_game.key}/results", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert result.status_code == 304
@@ -48,3 +48,9 @@ def main_game_css_should_respond_with_200_if_game_has_style(testclient: TestClie
     response = testclient.get(f"/game/{game.key}/custom.css")
     assert response.status_code == 200
     assert response.text == "body { color: red; }"
+
+
+def main_game_page_should_answer_a_matching_etag_with_not_modified(testclient: TestClient, game: Game) -> None:
+    etag = GamePage.open(testclient, game.key).response.headers["etag"]
+    result = testclient.get(f"/game/{game.key}", headers={"If-None-Match": etag})
+    assert result.status_code == 304
@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+from typing import Any
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from voting24.db.database import Database
+from voting24.game.game import Game
+from voting24.metrics import metrics
+from voting24.web.middleware import IdempotencyMiddleware
+
+
+def counting_app(status_code: int = 200, **limits: Any) -> tuple[IdempotencyMiddleware, list[bytes]]:
+    calls: list[bytes] = []
+
+    async def handle(request: Request) -> PlainTextResponse:
+        calls.append(await request.body())
+        await asyncio.sleep(0.01)
+        return PlainTextResponse(f"call {len(calls)}", status_code=status_code)
+
+    return IdempotencyMiddleware(Starlette(routes=[Route("/", handle, methods=["GET", "POST"])]), **limits), calls
+
+
+def post(client: TestClient, key: str, content: bytes = b"vote=a") -> httpx.Response:
+    return client.post("/", content=content, headers={"idempotency-key": key})
+
+
+def retried_vote_should_be_answered_without_voting_again(
+    testclient: TestClient,
+    database: Database,
+    game: Game,
+) -> None:
+    database.join_game(game.key, "player")
+    version = database.game_version(game.key)
+    testclient.cookies["player_name"] = "player"
+    headers = {"idempotency-key": str(uuid.uuid4())}
+    responses = [
+        testclient.post(
+            f"/game/{game.key}/item/key1",
+            data={"vote": "choicekey2"},
+            headers=headers,
+            follow_redirects=False,
+        )
+        for _ in range(3)
+    ]
+    assert [response.status_code for response in responses] == [303, 303, 303]
+    assert {response.headers["location"] for response in responses} == {f"/game/{game.key}/item/key2"}
+    assert [response.headers.get("idempotent-replayed") for response in responses] == [None, "true", "true"]
+    assert database.game_version(game.key) == version + 1
+
+
+def players_reusing_a_key_should_all_vote(testclient: TestClient, database: Database, game: Game) -> None:
+    headers = {"idempotency-key": str(uuid.uuid4())}
+    for player_name in ("player", "other"):
+        database.join_game(game.key, player_name)
+        testclient.cookies["player_name"] = player_name
+        response = testclient.post(
+            f"/game/{game.key}/item/key1",
+            data={"vote": "choicekey2"},
+            headers=headers,
+            follow_redirects=False,
+        )
+        assert "idempotent-replayed" not in response.headers
+    assert {result.item.key: result.score for result in database.results(game.key)} == {"key1": 4, "key2": 0}
+
+
+def retried_join_should_set_the_cookie_again(testclient: TestClient, game: Game) -> None:
+    headers = {"idempotency-key": str(uuid.uuid4())}
+
+    def join() -> httpx.Response:
+        return testclient.post(
+            f"/game/{game.key}/join",
+            data={"player_name": "player"},
+            headers=headers,
+            follow_redirects=False,
+        )
+
+    first = join()
+    # the response was lost, the retry has no cookie yet
+    testclient.cookies.clear()
+    retry = join()
+    assert first.status_code == retry.status_code == 303
+    assert retry.headers["set-cookie"] == first.headers["set-cookie"]
+
+
+def requests_should_run_without_a_key_or_with_another_body() -> None:
+    app, calls = counting_app()
+    client = TestClient(app)
+    client.post("/", content=b"vote=a")
+    client.post("/", content=b"vote=a")
+    post(client, "key")
+    post(client, "key", b"vote=b")
+    client.get("/", headers={"idempotency-key": "key"})
+    assert len(calls) == 5
+
+
+def concurrent_retries_should_wait_for_the_first_request() -> None:
+    app, calls = counting_app()
+
+    async def retry() -> list[str]:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *(client.post("/", content=b"vote=a", headers={"idempotency-key": "key"}) for _ in range(5)),
+            )
+        return [response.text for response in responses]
+
+    assert asyncio.run(retry()) == ["call 1"] * 5
+    assert calls == [b"vote=a"]
+
+
+@pytest.mark.parametrize("limits", [{"ttl": -1}, {"max_entries": 0}, {"max_body": 1}])
+def responses_should_not_be_kept_past_the_limits(limits: dict[str, Any]) -> None:
+    app, _ = counting_app(**limits)
+    client = TestClient(app)
+    assert post(client, "key").text == "call 1"
+    assert post(client, "key").text == "call 2"
+
+
+def server_errors_should_not_be_kept() -> None:
+    app, calls = counting_app(status_code=503)
+    client = TestClient(app)
+    post(client, "key")
+    post(client, "key")
+    assert len(calls) == 2
+
+
+def hits_and_misses_should_be_counted() -> None:
+    app, _ = counting_app()
+    client = TestClient(app)
+    before = metrics.snapshot()
+    post(client, "key")
+    post(client, "key")
+    post(client, "key")
+    after = metrics.snapshot()
+    assert after["idempotency.hits"] - before.get("idempotency.hits", 0) == 2
+    assert after["idempotency.misses"] - before.get("idempotency.misses", 0) == 1
@@ -0,0 +1,24 @@
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from voting24.db.sqlite_database import SqliteDatabase
+from voting24.game.game import Choice, Game, VoteItem
+from voting24.web.dependencies import get_database
+
+
+def requests_should_not_share_loaded_games(app: FastAPI, tmp_path: Path) -> None:
+    database = SqliteDatabase(tmp_path / "voting.db")
+    game = Game.new(name="game")
+    game.items = [VoteItem(key="key1", title="Vote item 1", text="", options=[Choice(key="a", text="A", value=1)])]
+    database.save_game(game)
+    app.dependency_overrides[get_database] = lambda: database
+    testclient = TestClient(app)
+
+    testclient.post("/game/game/join", data={"player_name": "player"})
+    testclient.post("/game/game/item/key1", data={"vote": "a"})
+    testclient.post("/game/game/join", data={"player_name": "other"})
+    testclient.post("/game/game/item/key1", data={"vote": "a"})
+    assert {result.item.key: result.score for result in database.results("game")} == {"key1": 2}
+    assert '<td class="score">2</td>' in testclient.get("/game/game/results.htmx").text
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from voting24.db.async_database import BatchingAsyncDatabase, ThreadedAsyncDatabase
+from voting24.db.database import InMemoryDatabase
+from voting24.db.file_database import FileDatabase
+from voting24.game.game import Choice, Game, VoteItem
+from voting24.metrics import metrics
+from voting24.web.dependencies import async_database_for, close_async_database, get_database
+from voting24.web.warmup import start_warm_up
+
+
+@pytest.fixture()
+def lifespan_app(app: FastAPI, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> FastAPI:
+    monkeypatch.setenv("DATABASE_DIR", str(tmp_path))
+    monkeypatch.delenv("DATABASE_SQLITE", raising=False)
+    game = Game.new(name="game")
+    game.items = [VoteItem(key="key1", title="Vote item 1", text="", options=[Choice(key="a", text="A", value=1)])]
+    FileDatabase(tmp_path).save_game(game)
+    del app.dependency_overrides[get_database]
+    return app
+
+
+def _wait_until_ready(testclient: TestClient) -> None:
+    deadline = time.monotonic() + 10
+    while testclient.get("/ready").status_code != 200:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def app_should_create_the_database_once(lifespan_app: FastAPI) -> None:
+    with TestClient(lifespan_app) as testclient:
+        database = lifespan_app.state.database
+        assert isinstance(database, FileDatabase)
+        assert testclient.get("/game/game").status_code == 200
+        assert testclient.get("/game/game/results").status_code == 200
+        assert lifespan_app.state.database is database
+
+
+def app_should_preload_the_games_before_reporting_ready(lifespan_app: FastAPI) -> None:
+    with TestClient(lifespan_app) as testclient:
+        _wait_until_ready(testclient)
+        misses = metrics.snapshot()["file_database.game_cache.misses"]
+        assert testclient.get("/game/game/results").status_code == 200
+        assert metrics.snapshot()["file_database.game_cache.misses"] == misses
+
+
+def ready_should_fail_while_the_app_is_not_running(testclient: TestClient) -> None:
+    assert testclient.get("/ready").status_code == 503
+
+
+def app_should_release_the_async_database_on_shutdown(lifespan_app: FastAPI) -> None:
+    with TestClient(lifespan_app):
+        database = lifespan_app.state.database
+        async_database = async_database_for(database)
+    assert async_database_for(database) is not async_database
+
+
+@pytest.mark.parametrize(("journal", "batching"), [(True, True), (False, False)])
+def vote_batches_should_only_be_collected_when_they_are_written_at_once(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    journal: bool,  # noqa: FBT001
+    batching: bool,  # noqa: FBT001
+) -> None:
+    monkeypatch.setenv("VOTE_BATCH_WINDOW_MS", "5")
+    database = FileDatabase(tmp_path, journal=journal)
+    assert isinstance(async_database_for(database), BatchingAsyncDatabase) == batching
+    asyncio.run(close_async_database(database))
+
+
+class _BrokenDatabase(InMemoryDatabase):
+    def __init__(self, broken: set[str]) -> None:
+        super().__init__()
+        self.broken = broken
+        self.loaded: list[str] = []
+
+    def game_keys(self) -> list[str]:
+        if "keys" in self.broken:
+            raise OSError
+        return ["broken", "game"]
+
+    def load_game(self, key: str) -> Game:
+        if key in self.broken:
+            raise ValueError(key)
+        self.loaded.append(key)
+        return Game.new(name=key)
+
+
+def _warm_up(database: InMemoryDatabase) -> FastAPI:
+    app = FastAPI()
+
+    async def run() -> None:
+        task = start_warm_up(app, ThreadedAsyncDatabase(database))
+        await asyncio.gather(task, return_exceptions=True)
+        # let the done callback run
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    return app
+
+
+def warm_up_should_skip_games_that_fail_to_load() -> None:
+    database = _BrokenDatabase({"broken"})
+    assert _warm_up(database).state.ready
+    assert database.loaded == ["game"]
+
+
+def warm_up_should_report_ready_when_it_fails(caplog: pytest.LogCaptureFixture) -> None:
+    assert _warm_up(_BrokenDatabase({"keys"})).state.ready
+    assert "Warm-up failed" in caplog.text
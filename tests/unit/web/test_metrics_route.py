@@ -0,0 +1,19 @@
+from fastapi.testclient import TestClient
+
+from voting24.metrics import metrics
+
+
+def metrics_should_return_all_counters(testclient: TestClient) -> None:
+    metrics.counter("test.counter").inc(3)
+    response = testclient.get("/metrics")
+    assert response.status_code == 200
+    assert response.json()["test.counter"] >= 3
+
+
+def metrics_should_return_count_sum_and_max_of_summaries(testclient: TestClient) -> None:
+    summary = metrics.summary("test.summary")
+    summary.observe(2)
+    summary.observe(5)
+    values = testclient.get("/metrics").json()
+    assert values["test.summary.count"] >= 2
+    assert values["test.summary.max"] >= 5
@@ -1,8 +1,9 @@
+import pytest
 from fastapi.testclient import TestClient
 
 from tests.page_objects.game_item_page import GameItemPage
 from voting24.db.database import Database
-from voting24.game.game import Game
+from voting24.game.game import Game, Player
 
 
 def play_item_should_return_404_if_game_does_not_exist(testclient: TestClient) -> None:
@@ -619,3 +620,21 @@ def post_play_item_vote_htmx_should_return_400_and_the_page_if_vote_is_invalid(
     page = GameItemPage(result)
     assert page.is_partial()
     assert page.vote_form()
+
+
+def play_item_should_not_load_the_other_players(
+    testclient: TestClient,
+    database: Database,
+    game: Game,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    database.join_game(game.key, "My Name")
+
+    def load_game(key: str) -> Game:
+        raise AssertionError
+
+    monkeypatch.setattr(database, "load_game", load_game)
+    monkeypatch.setattr(database, "load_game_metadata", lambda key: game)
+    monkeypatch.setattr(database, "load_player", lambda key, name: Player(name=name, votes={}))
+    testclient.cookies.set("player_name", "My Name")
+    assert testclient.get(f"/game/{game.key}/item/{game.items[0].key}").status_code == 200
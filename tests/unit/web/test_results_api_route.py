@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+
+from voting24.db.database import Database
+from voting24.game.game import Game
+from voting24.metrics import metrics
+
+
+def results_api_should_return_404_if_game_is_not_found(testclient: TestClient) -> None:
+    assert testclient.get("/api/game/some-key/results").status_code == 404
+
+
+def results_api_should_return_the_scores_of_all_items(testclient: TestClient, finished_game: Game) -> None:
+    response = testclient.get(f"/api/game/{finished_game.key}/results")
+    assert response.status_code == 200
+    results = response.json()
+    assert results["name"] == finished_game.name
+    assert results["since"] is None
+    assert [(item["key"], item["score"], item["count"], item["rank"]) for item in results["items"]] == [
+        ("key1", -2, 3, 2),
+        ("key2", 2, 3, 1),
+    ]
+
+
+def results_api_should_serialize_each_version_once(testclient: TestClient, finished_game: Game) -> None:
+    testclient.get(f"/api/game/{finished_game.key}/results")
+    builds = metrics.snapshot()["results_cache.builds"]
+    for _ in range(3):
+        testclient.get(f"/api/game/{finished_game.key}/results")
+    assert metrics.snapshot()["results_cache.builds"] == builds
+
+
+def results_api_should_return_only_the_items_changed_since_a_version(
+    testclient: TestClient,
+    database: Database,
+    finished_game: Game,
+) -> None:
+    version = testclient.get(f"/api/game/{finished_game.key}/results").json()["version"]
+    assert testclient.get(f"/api/game/{finished_game.key}/results?since={version}").json()["items"] == []
+
+    database.vote("player 1", finished_game.key, "key1", "choicekey3")
+    delta = testclient.get(f"/api/game/{finished_game.key}/results?since={version}").json()
+    assert delta["since"] == version
+    assert delta["version"] > version
+    assert [(item["key"], item["score"]) for item in delta["items"]] == [("key1", 0)]
+
+
+def results_api_should_return_all_items_since_an_unknown_version(testclient: TestClient, finished_game: Game) -> None:
+    results = testclient.get(f"/api/game/{finished_game.key}/results?since=12345").json()
+    assert results["since"] is None
+    assert len(results["items"]) == 2
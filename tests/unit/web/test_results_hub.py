@@ -0,0 +1,133 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+from voting24.db.async_database import ThreadedAsyncDatabase
+from voting24.db.database import InMemoryDatabase
+from voting24.game.game import Choice, Game, GameMetadata, ItemResult, VoteItem
+from voting24.web.results_hub import ResultsHub
+
+
+class _Renders:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, game: GameMetadata, results: list[ItemResult], no_sort: bool) -> str:  # noqa: FBT001
+        self.count += 1
+        points = ",".join(str(result.score) for result in results)
+        return f"{'unsorted' if no_sort else 'sorted'} {points}\nsecond line"
+
+
+def _database() -> ThreadedAsyncDatabase:
+    database = InMemoryDatabase()
+    game = Game.new(name="game")
+    game.items = [
+        VoteItem(key="key1", title="Vote item 1", text="", options=[
+            Choice(key="choicekey1", text="Choice A", value=1),
+            Choice(key="choicekey2", text="Choice B", value=2),
+        ]),
+    ]
+    database.save_game(game)
+    database.join_game("game", "player 1")
+    database.join_game("game", "player 2")
+    return ThreadedAsyncDatabase(database)
+
+
+async def _connected() -> bool:  # noqa: RUF029  # stands in for Request.is_disconnected
+    return False
+
+
+async def _subscribed() -> None:
+    # let the streams start and subscribe
+    await asyncio.sleep(0.01)
+
+
+async def _next(stream: AsyncIterator[str]) -> str:
+    return await asyncio.wait_for(anext(stream), 1)
+
+
+def results_hub_should_push_results_to_all_subscribers_from_one_render() -> None:
+    async def run() -> None:
+        database = _database()
+        renders = _Renders()
+        hub = ResultsHub(renders, interval=0)
+        streams = [hub.stream("game", no_sort=False, is_disconnected=_connected) for _ in range(3)]
+        pending = [asyncio.ensure_future(_next(stream)) for stream in streams]
+        await _subscribed()
+
+        await database.vote("player 1", "game", "key1", "choicekey2")
+        hub.notify(database, "game")
+
+        assert await asyncio.gather(*pending) == ["event: results\ndata: sorted 2\ndata: second line\n\n"] * 3
+        assert renders.count == 1
+
+    asyncio.run(run())
+
+
+def results_hub_should_render_once_per_sort_order() -> None:
+    async def run() -> None:
+        database = _database()
+        renders = _Renders()
+        hub = ResultsHub(renders, interval=0)
+        sorted_stream = hub.stream("game", no_sort=False, is_disconnected=_connected)
+        unsorted_stream = hub.stream("game", no_sort=True, is_disconnected=_connected)
+        pending = [asyncio.ensure_future(_next(sorted_stream)), asyncio.ensure_future(_next(unsorted_stream))]
+        await _subscribed()
+
+        await database.vote("player 1", "game", "key1", "choicekey1")
+        hub.notify(database, "game")
+
+        sorted_event, unsorted_event = await asyncio.gather(*pending)
+        assert "sorted 1" in sorted_event
+        assert "unsorted 1" in unsorted_event
+        assert renders.count == 2
+
+    asyncio.run(run())
+
+
+def results_hub_should_not_push_when_points_did_not_change() -> None:
+    async def run() -> None:
+        database = _database()
+        renders = _Renders()
+        hub = ResultsHub(renders, interval=0)
+        stream = hub.stream("game", no_sort=False, is_disconnected=_connected)
+        pending = asyncio.ensure_future(_next(stream))
+        await _subscribed()
+        await database.vote("player 1", "game", "key1", "choicekey2")
+        await hub.publish(database, "game")
+        await pending
+
+        # voting for the same choice again does not change the points
+        await database.vote("player 1", "game", "key1", "choicekey2")
+        await hub.publish(database, "game")
+        assert renders.count == 1
+
+    asyncio.run(run())
+
+
+def results_hub_should_coalesce_notifications() -> None:
+    async def run() -> None:
+        database = _database()
+        renders = _Renders()
+        hub = ResultsHub(renders, interval=0.01)
+        stream = hub.stream("game", no_sort=False, is_disconnected=_connected)
+        pending = asyncio.ensure_future(_next(stream))
+        await _subscribed()
+
+        await database.vote("player 1", "game", "key1", "choicekey2")
+        hub.notify(database, "game")
+        await database.vote("player 2", "game", "key1", "choicekey1")
+        hub.notify(database, "game")
+
+        assert "sorted 3" in await pending
+        assert renders.count == 1
+
+    asyncio.run(run())
+
+
+def results_hub_should_send_keepalives() -> None:
+    async def run() -> None:
+        hub = ResultsHub(_Renders(), keepalive=0.01)
+        stream = hub.stream("game", no_sort=False, is_disconnected=_connected)
+        assert await _next(stream) == ": keepalive\n\n"
+
+    asyncio.run(run())
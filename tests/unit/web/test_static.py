@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.page_objects.base import PageBase
+from voting24.game.game import Game
+from voting24.web import static
+from voting24.web.static import StaticFiles
+
+
+@pytest.fixture()
+def scripts(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> StaticFiles:
+    (tmp_path / "htmx.org" / "dist").mkdir(parents=True)
+    (tmp_path / "htmx.org" / "dist" / "htmx.min.js").write_text("var htmx = {};\n" * 200)
+    (tmp_path / "htmx.org" / "dist" / "other.js").write_text("var other = {};")
+    scripts = StaticFiles(tmp_path, ["htmx.org/dist/htmx.min.js"], "/js/npm/", "text/javascript")
+    monkeypatch.setattr(static, "npm_scripts", scripts)
+    return scripts
+
+
+@pytest.mark.usefixtures("scripts")
+def npm_script_should_be_gzipped_when_accepted(testclient: TestClient) -> None:
+    response = testclient.get("/js/npm/htmx.org/dist/htmx.min.js", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == "var htmx = {};\n" * 200
+
+
+@pytest.mark.usefixtures("scripts")
+def npm_script_should_be_sent_as_is_when_compression_is_not_accepted(testclient: TestClient) -> None:
+    response = testclient.get("/js/npm/htmx.org/dist/htmx.min.js", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in response.headers
+    assert response.content == b"var htmx = {};\n" * 200
+
+
+@pytest.mark.usefixtures("scripts")
+def npm_script_should_answer_conditional_requests_with_not_modified(testclient: TestClient) -> None:
+    first = testclient.get("/js/npm/htmx.org/dist/htmx.min.js")
+    by_etag = testclient.get("/js/npm/htmx.org/dist/htmx.min.js", headers={"If-None-Match": first.headers["etag"]})
+    by_date = testclient.get(
+        "/js/npm/htmx.org/dist/htmx.min.js",
+        headers={"If-Modified-Since": first.headers["last-modified"]},
+    )
+    assert by_etag.status_code == 304
+    assert by_date.status_code == 304
+
+
+@pytest.mark.usefixtures("scripts")
+def npm_scripts_outside_the_allowed_list_should_not_be_served(testclient: TestClient) -> None:
+    assert testclient.get("/js/npm/htmx.org/dist/other.js").status_code == 404
+
+
+def pages_should_load_scripts_from_versioned_urls(testclient: TestClient, game: Game, scripts: StaticFiles) -> None:
+    page = PageBase(testclient.get(f"/game/{game.key}"))
+    script = page.css.select_one("script[src]")
+    assert script
+    assert script.attrs["src"] == scripts.url("htmx.org/dist/htmx.min.js")
+    response = testclient.get(script.attrs["src"])
+    assert "immutable" in response.headers["cache-control"]
@@ -0,0 +1,40 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from voting24.db.database import Database
+from voting24.game.game import Game
+
+
+def stats_should_return_404_if_game_is_not_found(testclient: TestClient) -> None:
+    assert testclient.get("/api/game/some-key/stats").status_code == 404
+
+
+def stats_should_describe_the_votes_of_every_item(testclient: TestClient, finished_game: Game) -> None:
+    response = testclient.get(f"/api/game/{finished_game.key}/stats")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["key"] == finished_game.key
+    first, second = stats["items"]
+    assert first["key"] == "key1"
+    assert (first["count"], first["score"], first["rank"]) == (3, -2, 2)
+    assert first["distribution"] == {"choicekey1": 2, "choicekey2": 1, "choicekey3": 0}
+    assert first["mean"] == pytest.approx(-2 / 3)
+    assert first["variance"] == pytest.approx(2 / 9)
+    assert second["distribution"] == {"choicekey1": 0, "choicekey2": 1, "choicekey3": 2}
+    assert second["rank"] == 1
+
+
+def stats_should_follow_changed_votes(testclient: TestClient, database: Database, finished_game: Game) -> None:
+    # the players 1 and 2 voted -1, player 3 voted 0
+    database.vote("player 3", finished_game.key, "key1", "choicekey3")
+    first = testclient.get(f"/api/game/{finished_game.key}/stats").json()["items"][0]
+    assert first["distribution"] == {"choicekey1": 2, "choicekey2": 0, "choicekey3": 1}
+    assert first["mean"] == pytest.approx(-1 / 3)
+    assert first["variance"] == pytest.approx(8 / 9)
+    assert first["controversy"] == pytest.approx((8 / 9) ** 0.5)
+
+
+def stats_should_answer_a_matching_etag_with_not_modified(testclient: TestClient, finished_game: Game) -> None:
+    etag = testclient.get(f"/api/game/{finished_game.key}/stats").headers["etag"]
+    result = testclient.get(f"/api/game/{finished_game.key}/stats", headers={"If-None-Match": etag})
+    assert result.status_code == 304
@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+
+from voting24.db.database import Database
+from voting24.game.game import Game
+
+
+def votes_api_should_require_a_joined_player(testclient: TestClient, game: Game) -> None:
+    response = testclient.post(f"/api/game/{game.key}/votes", json={"votes": []})
+    assert response.status_code == 401
+
+
+def votes_api_should_return_404_if_game_is_not_found(testclient: TestClient) -> None:
+    testclient.cookies["player_name"] = "player"
+    assert testclient.post("/api/game/some-key/votes", json={"votes": []}).status_code == 404
+
+
+def votes_api_should_record_all_votes_at_once(testclient: TestClient, database: Database, game: Game) -> None:
+    database.join_game(game.key, "player")
+    version = database.game_version(game.key)
+    testclient.cookies["player_name"] = "player"
+    response = testclient.post(f"/api/game/{game.key}/votes", json={"votes": [
+        {"item": "key1", "vote": "choicekey1"},
+        {"item": "key2", "vote": "choicekey2"},
+    ]})
+    assert response.status_code == 200
+    assert [result["ok"] for result in response.json()] == [True, True]
+    assert {result.item.key: result.score for result in database.results(game.key)} == {"key1": 1, "key2": 2}
+    assert database.game_version(game.key) == version + 1
+
+
+def votes_api_should_report_failed_votes_per_item(testclient: TestClient, database: Database, game: Game) -> None:
+    database.join_game(game.key, "player")
+    testclient.cookies["player_name"] = "player"
+    response = testclient.post(f"/api/game/{game.key}/votes", json={"votes": [
+        {"item": "key1", "vote": "choicekey2"},
+        {"item": "unknown", "vote": "choicekey1"},
+        {"item": "key2", "vote": "unknown"},
+    ]})
+    assert response.status_code == 200
+    results = response.json()
+    assert [(result["item"], result["ok"]) for result in results] == [
+        ("key1", True),
+        ("unknown", False),
+        ("key2", False),
+    ]
+    assert "unknown" in results[1]["error"]
+    assert {result.item.key: result.score for result in database.results(game.key)} == {"key1": 2, "key2": 0}
+
+
+def votes_api_should_fail_every_vote_of_a_player_who_has_not_joined(testclient: TestClient, game: Game) -> None:
+    testclient.cookies["player_name"] = "stranger"
+    response = testclient.post(f"/api/game/{game.key}/votes", json={"votes": [{"item": "key1", "vote": "choicekey1"}]})
+    assert response.json()[0]["ok"] is False
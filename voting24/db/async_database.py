@@ -0,0 +1,202 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Sequence
+from functools import partial
+from typing import TypeVar
+
+import anyio
+import anyio.to_thread
+
+from voting24.db.database import Database, DatabaseError, Vote
+from voting24.game.game import Game, GameMetadata, ItemResult, Key, Name, Player
+from voting24.metrics import metrics
+
+T = TypeVar("T")
+
+_batch_sizes = metrics.summary("votes.batch_size")
+_commit_seconds = metrics.summary("votes.commit_seconds")
+
+
+class AsyncDatabase(ABC):
+    @abstractmethod
+    async def save_game(self, game: Game) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def load_game(self, key: Key) -> Game:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def load_game_metadata(self, key: Key) -> GameMetadata:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def load_player(self, key: Key, player_name: Name) -> Player:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def vote_many(self, game_key: Key, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def game_version(self, key: Key) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def results(self, key: Key) -> list[ItemResult]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def game_keys(self) -> list[Key]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def close(self) -> None:
+        raise NotImplementedError
+
+
+class ThreadedAsyncDatabase(AsyncDatabase):
+    # Runs the calls of a blocking Database in worker threads, at most max_concurrency at a time, so that database
+    # I/O neither blocks the event loop nor competes with everything else for the shared thread pool.
+    # Writes have a limit of their own: they mostly wait for the lock of their game or for the disk, and would otherwise
+    # take up all the threads and keep the quick reads, like the version the results are polled with, waiting.
+    # Databases that never block are called directly on the event loop.
+
+    def __init__(self, database: Database, max_concurrency: int = 16, max_write_concurrency: int = 4) -> None:
+        self.database = database
+        self.max_concurrency = max_concurrency
+        self.max_write_concurrency = max_write_concurrency
+        self._limiters: dict[bool, anyio.CapacityLimiter] = {}
+
+    async def save_game(self, game: Game) -> None:
+        await self._run(partial(self.database.save_game, game), write=True)
+
+    async def load_game(self, key: Key) -> Game:
+        return await self._run(partial(self.database.load_game, key))
+
+    async def load_game_metadata(self, key: Key) -> GameMetadata:
+        return await self._run(partial(self.database.load_game_metadata, key))
+
+    async def load_player(self, key: Key, player_name: Name) -> Player:
+        return await self._run(partial(self.database.load_player, key, player_name))
+
+    async def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
+        return await self._run(
+            partial(self.database.join_game, key, player_name, join_as_existing=join_as_existing),
+            write=True,
+        )
+
+    async def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
+        await self._run(partial(self.database.vote, player_name, game_key, item_key, vote_key), write=True)
+
+    async def vote_many(self, game_key: Key, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        return await self._run(partial(self.database.vote_many, game_key, votes), write=True)
+
+    async def game_version(self, key: Key) -> int:
+        return await self._run(partial(self.database.game_version, key))
+
+    async def results(self, key: Key) -> list[ItemResult]:
+        return await self._run(partial(self.database.results, key))
+
+    async def game_keys(self) -> list[Key]:
+        return await self._run(self.database.game_keys)
+
+    async def close(self) -> None:
+        # may wait for background work even when the calls themselves don't block
+        await anyio.to_thread.run_sync(self.database.close)
+
+    async def _run(self, call: Callable[[], T], *, write: bool = False) -> T:
+        if not self.database.blocking:
+            return call()
+        if (limiter := self._limiters.get(write)) is None:
+            # the limiters can only be created inside a running event loop
+            limiter = self._limiters[write] = anyio.CapacityLimiter(
+                self.max_write_concurrency if write else self.max_concurrency,
+            )
+        return await anyio.to_thread.run_sync(call, limiter=limiter)
+
+
+class BatchingAsyncDatabase(AsyncDatabase):
+    # Group commit for votes: votes to the same game that arrive within window seconds of the first one are written
+    # with a single vote_many call, and every vote returns (or raises) once that batch has been written.
+    # Everything else is passed through as is.
+
+    def __init__(self, database: AsyncDatabase, window: float = 0.005) -> None:
+        self.database = database
+        self.window = window
+        self._batches: dict[Key, list[tuple[Vote, asyncio.Future[None]]]] = {}
+        self._commits: set[asyncio.Task[None]] = set()
+
+    async def save_game(self, game: Game) -> None:
+        await self.database.save_game(game)
+
+    async def load_game(self, key: Key) -> Game:
+        return await self.database.load_game(key)
+
+    async def load_game_metadata(self, key: Key) -> GameMetadata:
+        return await self.database.load_game_metadata(key)
+
+    async def load_player(self, key: Key, player_name: Name) -> Player:
+        return await self.database.load_player(key, player_name)
+
+    async def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
+        return await self.database.join_game(key, player_name, join_as_existing=join_as_existing)
+
+    async def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
+        future = asyncio.get_running_loop().create_future()
+        if (batch := self._batches.get(game_key)) is None:
+            batch = self._batches[game_key] = []
+            commit = asyncio.get_running_loop().create_task(self._commit_later(game_key))
+            self._commits.add(commit)
+            commit.add_done_callback(self._commits.discard)
+        batch.append(((player_name, item_key, vote_key), future))
+        # the batch is written even if this request goes away, so don't let cancellation reach the future
+        await asyncio.shield(future)
+
+    async def vote_many(self, game_key: Key, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        return await self.database.vote_many(game_key, votes)
+
+    async def game_version(self, key: Key) -> int:
+        return await self.database.game_version(key)
+
+    async def results(self, key: Key) -> list[ItemResult]:
+        return await self.database.results(key)
+
+    async def game_keys(self) -> list[Key]:
+        return await self.database.game_keys()
+
+    async def close(self) -> None:
+        # the votes waiting for their batch are written before the database goes away
+        while self._commits:
+            await asyncio.gather(*self._commits)
+        await self.database.close()
+
+    async def _commit_later(self, game_key: Key) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            # votes arriving from now on start the next batch
+            batch = self._batches.pop(game_key)
+        started = time.perf_counter()
+        try:
+            errors = await self.database.vote_many(game_key, [vote for vote, _ in batch])
+        except Exception as e:  # noqa: BLE001  # handed over to the waiting votes
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        _batch_sizes.observe(len(batch))
+        _commit_seconds.observe(time.perf_counter() - started)
+        for (_, future), error in zip(batch, errors, strict=True):
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
@@ -1,6 +1,12 @@
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import ClassVar
 
-from voting24.game.game import Game, Key, Name, Player
+from voting24.db.locks import KeyedLocks
+from voting24.game.game import Game, GameMetadata, ItemResult, Key, Name, Player
+
+# player name, item key and choice key
+Vote = tuple[Name, Key, Key]
 
 
 class DatabaseError(Exception):
@@ -39,7 +45,24 @@ class ChoiceNotFoundError(DatabaseError):
         self.key = key
 
 
+def voting_player(game: Game, vote: Vote) -> Player:
+    # the player casting the vote, if the vote is valid in the game
+    player_name, item_key, vote_key = vote
+    item = game.item(item_key)
+    if not item:
+        raise VoteItemNotFoundError(item_key, game.name)
+    if not item.choice(vote_key):
+        raise ChoiceNotFoundError(vote_key, item_key, game.name)
+    player = game.player(player_name)
+    if not player:
+        raise PlayerNotFoundError(player_name, game.name)
+    return player
+
+
 class Database(ABC):
+    # whether the calls may block on I/O and should be kept off the event loop
+    blocking: ClassVar[bool] = True
+
     @abstractmethod
     def save_game(self, game: Game) -> None:
         raise NotImplementedError
@@ -48,6 +71,16 @@ class Database(ABC):
     def load_game(self, key: Key) -> Game:
         raise NotImplementedError
 
+    def load_game_metadata(self, key: Key) -> GameMetadata:
+        # the game without its players, backends that store the players separately skip reading them
+        return self.load_game(key)
+
+    def load_player(self, key: Key, player_name: Name) -> Player:
+        game = self.load_game(key)
+        if player := game.player(player_name):
+            return player
+        raise PlayerNotFoundError(player_name, game.name)
+
     @abstractmethod
     def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
         raise NotImplementedError
@@ -56,13 +89,53 @@ class Database(ABC):
     def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
         raise NotImplementedError
 
+    def vote_many(self, game_key: Key, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        # Applies the votes in order and returns the error of each vote, or None if it was recorded. A missing game
+        # fails the whole batch. Backends override this to persist the batch with a single write.
+        errors: list[DatabaseError | None] = []
+        for player_name, item_key, vote_key in votes:
+            try:
+                self.vote(player_name, game_key, item_key, vote_key)
+            except GameNotFoundError:
+                raise
+            except DatabaseError as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        return errors
+
+    @abstractmethod
+    def game_version(self, key: Key) -> int:
+        # increases every time the game is saved, joined or voted in
+        raise NotImplementedError
+
+    @abstractmethod
+    def game_keys(self) -> list[Key]:
+        # the most recently active games first, as far as the backend can tell
+        raise NotImplementedError
+
+    def close(self) -> None:  # noqa: PLR6301  # overridden by backends that hold on to resources
+        # Waits for background work and releases what the database holds on to, called once on shutdown
+        return
+
+    def results(self, key: Key) -> list[ItemResult]:
+        # what the results pages show, backends that can count the votes without loading the players override it
+        return self.load_game(key).results()
+
 
 class InMemoryDatabase(Database):
+    blocking = False
+
     def __init__(self, games: dict[Key, Game] | None = None) -> None:
         self.games: dict[Key, Game] = games or {}
+        self.versions: dict[Key, int] = dict.fromkeys(self.games, 0)
+        # writes to a game happen under its lock, readers get the shared game object as is
+        self._locks = KeyedLocks()
 
     def save_game(self, game: Game) -> None:
-        self.games[game.key] = game
+        with self._locks(game.key):
+            self.games[game.key] = game
+            self._bump_version(game.key)
 
     def load_game(self, key: Key) -> Game:
         try:
@@ -71,23 +144,45 @@ class InMemoryDatabase(Database):
             raise GameNotFoundError(key) from None
 
     def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
-        game = self.load_game(key)
-        if not join_as_existing and player_name in (player.name for player in game.players):
-            raise PlayerAlreadyExistsError(game.name, player_name)
-        player = Player.new(name=player_name)
-        self.games[key].players.append(player)
-        return player
+        with self._locks(key):
+            game = self.load_game(key)
+            if existing := game.player(player_name):
+                if not join_as_existing:
+                    raise PlayerAlreadyExistsError(game.name, player_name)
+                return existing
+            player = Player.new(name=player_name)
+            game.add_player(player)
+            self._bump_version(key)
+            return player
 
     def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
-        game = self.load_game(game_key)
-        item = next((item for item in game.items if item.key == item_key), None)
-        if not item:
-            raise VoteItemNotFoundError(item_key, game.name)
-        if not next((option for option in item.options if option.key == vote_key), None):
-            raise ChoiceNotFoundError(vote_key, item_key, game.name)
-        for player in game.players:
-            if player.name == player_name:
-                player.votes[item_key] = vote_key
-                break
-        else:
-            raise PlayerNotFoundError(player_name, game.name)
+        if error := self.vote_many(game_key, [(player_name, item_key, vote_key)])[0]:
+            raise error
+
+    def vote_many(self, game_key: Key, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        with self._locks(game_key):
+            game = self.load_game(game_key)
+            errors: list[DatabaseError | None] = []
+            for vote in votes:
+                try:
+                    player = voting_player(game, vote)
+                except DatabaseError as e:
+                    errors.append(e)
+                    continue
+                _, item_key, vote_key = vote
+                game.set_vote(player, item_key, vote_key)
+                errors.append(None)
+            if None in errors:
+                self._bump_version(game_key)
+            return errors
+
+    def game_version(self, key: Key) -> int:
+        if key not in self.games:
+            raise GameNotFoundError(key)
+        return self.versions.get(key, 0)
+
+    def game_keys(self) -> list[Key]:
+        return list(self.games)
+
+    def _bump_version(self, key: Key) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
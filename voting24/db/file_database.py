@@ -1,64 +1,400 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from collections.abc import Generator, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TextIO
+
+from pydantic_core import from_json
 
 from voting24.db.database import (
-    ChoiceNotFoundError,
     Database,
+    DatabaseError,
     GameNotFoundError,
     PlayerAlreadyExistsError,
     PlayerNotFoundError,
-    VoteItemNotFoundError,
+    Vote,
+    voting_player,
 )
-from voting24.game.game import Game, Key, Name, Player
+from voting24.db.identity_map import forget, mapped, mapped_game, remember
+from voting24.db.locks import KeyedLocks
+from voting24.game.game import Game, GameMetadata, Key, Name, Player
+from voting24.metrics import metrics
+
+_logger = logging.getLogger(__name__)
+_cache_hits = metrics.counter("file_database.game_cache.hits")
+_cache_misses = metrics.counter("file_database.game_cache.misses")
+
+_StatToken = tuple[int, int, int] | None
+
+
+@dataclass
+class _CachedGame:
+    token: tuple[_StatToken, ...]
+    game: Game
 
 
 class FileDatabase(Database):
-    def __init__(self, path: Path) -> None:
+    # In journal mode votes are appended to <key>.votes.log instead of rewriting the player file, and loading
+    # replays the log over the player files. The log gets folded into the player files in the background every
+    # compact_after votes. Replay is last write wins per player and item, so loading is safe mid-compaction.
+    #
+    # The version of a game is the number in <key>.version plus the size of the log, so that a vote in journal mode is
+    # a single append. Compaction adds the size of the log to the version file before it moves the log away.
+    #
+    # Loaded games are cached and shared between callers. Writes made through this instance update the cached game
+    # in place, writes from other processes are noticed from the mtimes of the game file, the players directory
+    # (player files are replaced, not rewritten) and the logs. Compaction writes the player files next to the game
+    # and only moves them into place under the game lock, so it does not invalidate the cached game.
+
+    def __init__(self, path: Path, *, journal: bool = False, compact_after: int = 1000) -> None:
         self.path = path
+        self.journal = journal
+        self.compact_after = compact_after
+        self._journal_sizes: dict[Key, int] = defaultdict(int)
+        self._compaction_locks = KeyedLocks()
+        self._cache: dict[Key, _CachedGame] = {}
+        self._metadata_cache: dict[Key, tuple[_StatToken, GameMetadata]] = {}
+        # Loading, writing and the cached copy of a game are guarded by its lock, so different games never wait on
+        # each other and writes to the same game cannot lose each other's updates
+        self._locks = KeyedLocks()
+        self._compactions: set[threading.Thread] = set()
 
     def save_game(self, game: Game) -> None:
         game_path = self.path / f"{game.key}.json"
-        game_path.write_text(game.json())
+        with self._locks(game.key):
+            self._cache.pop(game.key, None)
+            forget(self, game.key)
+            _write_atomic(game_path, game.model_dump_json())
+            self._bump_version(game.key)
 
     def load_game(self, key: Key) -> Game:
-        game_path = self.path / f"{key}.json"
-        if not game_path.exists():
+        # within a request the files are checked once, later loads get the same game
+        if game := mapped_game(self, key):
+            return game
+        return remember(self, self._load_game(key))
+
+    def _load_game(self, key: Key) -> Game:
+        while True:
+            with self._locks(key):
+                token = self._cache_token(key)
+                if token[0] is None:
+                    self._cache.pop(key, None)
+                    raise GameNotFoundError(key)
+                cached = self._cache.get(key)
+                if cached and cached.token == token:
+                    _cache_hits.inc()
+                    return cached.game
+                _cache_misses.inc()
+                game = self._read_game(key)
+                self._replay_journal(game)
+                if self._cache_token(key) == token:
+                    self._cache[key] = _CachedGame(token, game)
+                    return game
+                self._cache.pop(key, None)
+            # another process changed the files halfway through reading them, the other threads go first
+
+    def load_game_metadata(self, key: Key) -> GameMetadata:
+        # Only needs the game file, players are neither read nor replayed
+        if game := mapped(self, key):
+            return game
+        if (cached := self._cache.get(key)) and cached.token == self._cache_token(key):
+            return remember(self, cached.game)
+        token = _stat(self.path / f"{key}.json")
+        if token is None:
             raise GameNotFoundError(key)
-        game = Game.model_validate_json(game_path.read_text())
-        game.players = self._load_players(game.key)
-        return game
+        if (metadata := self._metadata_cache.get(key)) and metadata[0] == token:
+            return remember(self, metadata[1])
+        # without the players there is little to validate, pydantic does that faster than Game.from_trusted would
+        game = GameMetadata.model_validate_json((self.path / f"{key}.json").read_bytes())
+        self._metadata_cache[key] = (token, game)
+        return remember(self, game)
 
-    def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
-        game = self.load_game(key)
-        if not join_as_existing and player_name in (player.name for player in game.players):
-            raise PlayerAlreadyExistsError(game.name, player_name)
-        player = Player.new(name=player_name)
-        self._save_player(player, game)
+    def load_player(self, key: Key, player_name: Name) -> Player:
+        # Reads just the player file and the player's records from the logs, unless the whole game is loaded anyway
+        if not (loaded := mapped_game(self, key)) and (cached := self._cache.get(key)):
+            loaded = cached.game if cached.token == self._cache_token(key) else None
+        if loaded:
+            if player := loaded.player(player_name):
+                return player
+            raise PlayerNotFoundError(player_name, loaded.name)
+        game = self.load_game_metadata(key)
+        with self._locks(key):
+            return self._read_player(key, player_name, game.name)
+
+    def _read_player(self, key: Key, player_name: Name, game_name: str) -> Player:
+        # The game lock keeps the compaction of this instance out, another process compacting the game may still
+        # change the files halfway through, so then they are read again
+        token = self._cache_token(key)
+        try:
+            player = Player.from_trusted_json((self.path / key / f"{player_name}.json").read_bytes())
+        except FileNotFoundError:
+            raise PlayerNotFoundError(player_name, game_name) from None
+        for log_path in (self._compacting_path(key), self._journal_path(key)):
+            for record_player_name, item_key, vote_key in _records(log_path):
+                if record_player_name == player_name:
+                    player.votes[item_key] = vote_key
+        if self._cache_token(key) != token:
+            return self._read_player(key, player_name, game_name)
         return player
 
-    def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
-        game = self.load_game(game_key)
-        item = next((item for item in game.items if item.key == item_key), None)
-        if not item:
-            raise VoteItemNotFoundError(item_key, game.name)
-        if not next((option for option in item.options if option.key == vote_key), None):
-            raise ChoiceNotFoundError(vote_key, item_key, game.name)
-        for player in game.players:
-            if player.name == player_name:
-                player.votes[item_key] = vote_key
+    def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
+        with self._locks(key):
+            # always checked against the files, the game then replaces whatever this request had loaded before
+            game = remember(self, self._load_game(key))
+            if existing := game.player(player_name):
+                if not join_as_existing:
+                    raise PlayerAlreadyExistsError(game.name, player_name)
+                return existing
+            player = Player.new(name=player_name)
+            with self._updating_cache(game.key):
                 self._save_player(player, game)
-                break
+                game.add_player(player)
+            self._bump_version(key)
+            return player
+
+    def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
+        if error := self.vote_many(game_key, [(player_name, item_key, vote_key)])[0]:
+            raise error
+
+    def vote_many(self, game_key: Key, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        # The whole batch is applied with one load and persisted with one journal append, or one write per player
+        with self._locks(game_key):
+            game = remember(self, self._load_game(game_key))
+            errors: list[DatabaseError | None] = []
+            accepted: list[tuple[Player, Vote]] = []
+            for vote in votes:
+                try:
+                    accepted.append((voting_player(game, vote), vote))
+                except DatabaseError as e:
+                    errors.append(e)
+                else:
+                    errors.append(None)
+            if not accepted:
+                return errors
+            with self._updating_cache(game.key):
+                for player, (_, item_key, vote_key) in accepted:
+                    game.set_vote(player, item_key, vote_key)
+                if self.journal:
+                    # growing the log is what bumps the version
+                    self._append_votes(game.key, [vote for _, vote in accepted])
+                else:
+                    for player in {player.name: player for player, _ in accepted}.values():
+                        self._save_player(player, game)
+                    self._bump_version(game_key)
+            return errors
+
+    def game_version(self, key: Key) -> int:
+        # under the lock, compaction moves the size of the log into the version file in two steps
+        with self._locks(key):
+            try:
+                version = self._stored_version(key)
+            except FileNotFoundError:
+                if not (self.path / f"{key}.json").exists():
+                    raise GameNotFoundError(key) from None
+                version = 0
+            log = _stat(self._journal_path(key))
+            return version + (log[1] if log else 0)
+
+    def game_keys(self) -> list[Key]:
+        # the version file or the log is touched by every change, the game file only when the game is saved
+        def last_change(game_path: Path) -> int:
+            key = game_path.stem
+            stats = [_stat(game_path), _stat(self._version_path(key)), _stat(self._journal_path(key))]
+            return max(stat[0] for stat in stats if stat) if any(stats) else 0
+
+        return [path.stem for path in sorted(self.path.glob("*.json"), key=last_change, reverse=True)]
+
+    def close(self) -> None:
+        # an interrupted compaction is safe, but would leave the next load to replay the log again
+        for compaction in list(self._compactions):
+            compaction.join()
+
+    def compact(self, key: Key) -> None:
+        with self._compaction_locks(key):
+            log_path = self._journal_path(key)
+            compacting_path = self._compacting_path(key)
+            # A leftover from an interrupted compaction is folded in first, the current log waits for the next round
+            if not compacting_path.exists():
+                with self._locks(key):
+                    if (log := _stat(log_path)) is None:
+                        return
+                    # written first, a crash in between can only make the version jump ahead
+                    self._store_version(key, self._version(key) + log[1], sync=True)
+                    with self._updating_cache(key):
+                        log_path.replace(compacting_path)
+                    self._journal_sizes[key] = 0
+
+            game = self._read_game(key)
+            changed = _replay(game, compacting_path)
+            # Writing the files takes long, moving them into place doesn't. Replay is last write wins, so the loaded
+            # game stays up to date when the log it already replayed gets folded into the player files.
+            staged: list[tuple[Path, Path]] = []
+            try:
+                for player_name in changed:
+                    if player := game.player(player_name):
+                        path = self.path / key / f"{player_name}.json"
+                        staged.append((_write_staged(path, player.model_dump_json(), self.path), path))
+                with self._locks(key), self._updating_cache(key):
+                    for staged_path, path in staged:
+                        staged_path.replace(path)
+                    compacting_path.unlink()
+            except BaseException:
+                for staged_path, _ in staged:
+                    staged_path.unlink(missing_ok=True)
+                raise
+            _logger.info("Compacted %d players into game %s", len(changed), key)
+
+    def _append_votes(self, game_key: Key, votes: Sequence[Vote]) -> None:
+        records = "".join(
+            json.dumps(list(vote), ensure_ascii=False, separators=(",", ":")) + "\n" for vote in votes
+        )
+        with self._locks(game_key):
+            with self._journal_path(game_key).open("a", encoding="utf-8") as log:
+                _write(log, records, sync=True)
+            self._journal_sizes[game_key] += len(votes)
+            should_compact = self._journal_sizes[game_key] >= self.compact_after
+            if should_compact:
+                self._journal_sizes[game_key] = 0
+        if should_compact:
+            compaction = threading.Thread(target=self._compact_in_background, args=(game_key,), daemon=True)
+            self._compactions.add(compaction)
+            compaction.start()
+
+    def _compact_in_background(self, key: Key) -> None:
+        try:
+            self.compact(key)
+        finally:
+            self._compactions.discard(threading.current_thread())
+
+    def _replay_journal(self, game: Game) -> None:
+        _replay(game, self._compacting_path(game.key))
+        _replay(game, self._journal_path(game.key))
+
+    @contextmanager
+    def _updating_cache(self, key: Key) -> Generator[None, None, None]:
+        cached = self._cache.get(key)
+        up_to_date = cached is not None and cached.token == self._cache_token(key)
+        try:
+            yield
+        except BaseException:
+            self._cache.pop(key, None)
+            raise
+        # The write came from us, so the cached game is already up to date with it unless someone else wrote too
+        if cached and up_to_date:
+            cached.token = self._cache_token(key)
         else:
-            raise PlayerNotFoundError(player_name, game.name)
+            self._cache.pop(key, None)
+
+    def _cache_token(self, key: Key) -> tuple[_StatToken, ...]:
+        return (
+            _stat(self.path / f"{key}.json"),
+            _stat(self.path / key),
+            _stat(self._compacting_path(key)),
+            _stat(self._journal_path(key)),
+        )
+
+    def _bump_version(self, key: Key) -> None:
+        # only used for cache validation, so it does not need to survive a crash
+        self._store_version(key, self._version(key) + 1, sync=False)
+
+    def _version(self, key: Key) -> int:
+        try:
+            return self._stored_version(key)
+        except FileNotFoundError:
+            return 0
+
+    def _stored_version(self, key: Key) -> int:
+        return int(self._version_path(key).read_text())
+
+    def _store_version(self, key: Key, version: int, *, sync: bool) -> None:
+        _write_atomic(self._version_path(key), str(version), sync=sync)
+
+    def _version_path(self, game_key: Key) -> Path:
+        return self.path / f"{game_key}.version"
+
+    def _journal_path(self, game_key: Key) -> Path:
+        return self.path / f"{game_key}.votes.log"
+
+    def _compacting_path(self, game_key: Key) -> Path:
+        return self.path / f"{game_key}.votes.log.compacting"
 
     def _save_player(self, player: Player, game: Game) -> None:
         players_dir = self.path / game.key
         if not players_dir.exists():
-            players_dir.mkdir()
+            players_dir.mkdir(exist_ok=True)
         player_path = players_dir / f"{player.name}.json"
-        player_path.write_text(player.json())
+        _write_atomic(player_path, player.model_dump_json())
 
-    def _load_players(self, game_key: Key) -> list[Player]:
-        players_dir = self.path / game_key
-        if not players_dir.exists():
-            return []
-        return [Player.model_validate_json(player_path.read_text()) for player_path in players_dir.glob("*.json")]
+    def _read_game(self, key: Key) -> Game:
+        # Everything in the directory was written by save_game and the player writes, which validated it already
+        data = from_json((self.path / f"{key}.json").read_bytes())
+        players_dir = self.path / key
+        data["players"] = [from_json(path.read_bytes()) for path in players_dir.glob("*.json")]
+        return Game.from_trusted(data)
+
+
+def _stat(path: Path) -> _StatToken:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _write_atomic(path: Path, content: str, *, sync: bool = True) -> None:
+    # Readers may load the game at any moment, so never let them see a half written file
+    staged_path = _write_staged(path, content, path.parent, sync=sync)
+    try:
+        staged_path.replace(path)
+    except BaseException:
+        staged_path.unlink(missing_ok=True)
+        raise
+
+
+def _write_staged(path: Path, content: str, directory: Path, *, sync: bool = True) -> Path:
+    # a temporary file in directory, which has to be on the same file system for the file to be moved to path
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            _write(tmp, content, sync=sync)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return Path(tmp_name)
+
+
+def _write(file: TextIO, content: str, *, sync: bool) -> None:
+    file.write(content)
+    if sync:
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _replay(game: Game, log_path: Path) -> set[Name]:
+    changed: set[Name] = set()
+    for player_name, item_key, vote_key in _records(log_path):
+        if player := game.player(player_name):
+            game.set_vote(player, item_key, vote_key)
+            changed.add(player_name)
+    return changed
+
+
+def _records(log_path: Path) -> Iterator[Vote]:
+    try:
+        lines = log_path.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return
+    for line in lines:
+        try:
+            player_name, item_key, vote_key = json.loads(line)
+        except ValueError:
+            # most likely the tail of a write that was interrupted
+            _logger.warning("Skipping malformed record in %s: %r", log_path, line)
+            continue
+        yield player_name, item_key, vote_key
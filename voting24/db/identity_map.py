@@ -0,0 +1,67 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
+from voting24.game.game import Game, GameMetadata, Key
+
+G = TypeVar("G", bound=GameMetadata)
+
+
+class IdentityMap:
+    # The games loaded during one request, so that loading a game again within the request gets the very same object
+    # instead of reading and parsing it again. Closed when the request ends, so that tasks started by the request
+    # don't keep seeing its snapshot.
+
+    def __init__(self) -> None:
+        self._games: dict[tuple[int, Key], GameMetadata] = {}
+        self.closed = False
+
+    def get(self, database: object, key: Key) -> GameMetadata | None:
+        return None if self.closed else self._games.get((id(database), key))
+
+    def add(self, database: object, game: GameMetadata) -> None:
+        if not self.closed:
+            self._games[id(database), game.key] = game
+
+    def discard(self, database: object, key: Key) -> None:
+        self._games.pop((id(database), key), None)
+
+    def close(self) -> None:
+        self.closed = True
+        self._games.clear()
+
+
+_current: ContextVar[IdentityMap | None] = ContextVar("identity_map", default=None)
+
+
+@contextmanager
+def request_scope() -> Generator[IdentityMap, None, None]:
+    identity_map = IdentityMap()
+    token = _current.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        identity_map.close()
+        _current.reset(token)
+
+
+def mapped(database: object, key: Key) -> GameMetadata | None:
+    identity_map = _current.get()
+    return identity_map.get(database, key) if identity_map else None
+
+
+def mapped_game(database: object, key: Key) -> Game | None:
+    game = mapped(database, key)
+    return game if isinstance(game, Game) else None
+
+
+def remember(database: object, game: G) -> G:
+    if identity_map := _current.get():
+        identity_map.add(database, game)
+    return game
+
+
+def forget(database: object, key: Key) -> None:
+    if identity_map := _current.get():
+        identity_map.discard(database, key)
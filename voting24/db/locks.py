@@ -0,0 +1,17 @@
+import threading
+
+from voting24.game.game import Key
+
+
+class KeyedLocks:
+    # One reentrant lock per key, so that threads working on different games never wait for each other.
+    # Locks are never removed, there are only ever a handful of games.
+
+    def __init__(self) -> None:
+        self._locks: dict[Key, threading.RLock] = {}
+
+    def __call__(self, key: Key) -> threading.RLock:
+        if (lock := self._locks.get(key)) is None:
+            # setdefault is atomic, so racing threads all end up with the same lock
+            lock = self._locks.setdefault(key, threading.RLock())
+        return lock
@@ -0,0 +1,321 @@
+import sqlite3
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+
+from voting24.db.database import (
+    ChoiceNotFoundError,
+    Database,
+    DatabaseError,
+    GameNotFoundError,
+    PlayerAlreadyExistsError,
+    PlayerNotFoundError,
+    Vote,
+    VoteItemNotFoundError,
+)
+from voting24.db.identity_map import forget, mapped, mapped_game, remember
+from voting24.game.game import Game, GameMetadata, ItemResult, Key, Name, Player
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    css TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    metadata_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS items (
+    game_key TEXT NOT NULL REFERENCES games (key) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    icon TEXT,
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    image_url TEXT,
+    PRIMARY KEY (game_key, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS choices (
+    game_key TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (game_key, item_key, key),
+    FOREIGN KEY (game_key, item_key) REFERENCES items (game_key, key) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS players (
+    game_key TEXT NOT NULL REFERENCES games (key) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    CONSTRAINT unique_player_name UNIQUE (game_key, name)
+);
+CREATE TABLE IF NOT EXISTS votes (
+    game_key TEXT NOT NULL,
+    player_name TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    choice_key TEXT NOT NULL,
+    PRIMARY KEY (game_key, player_name, item_key),
+    FOREIGN KEY (game_key, player_name) REFERENCES players (game_key, name) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS votes_by_item ON votes (game_key, item_key, choice_key);
+"""
+
+# Votes are not tied to the choices with a foreign key, so that saving a game again does not wipe them.
+# A vote for a choice that no longer exists simply does not count.
+_VOTE = """
+INSERT INTO votes (game_key, player_name, item_key, choice_key)
+SELECT game_key, :player_name, item_key, key FROM choices
+WHERE game_key = :game_key AND item_key = :item_key AND key = :vote_key
+ON CONFLICT (game_key, player_name, item_key) DO UPDATE SET choice_key = excluded.choice_key
+"""
+
+_BUMP_VERSION = "UPDATE games SET version = version + 1 WHERE key = ?"
+
+# The number of votes per choice, counted straight from the covering index, the rest of the results follow from them
+_VOTE_COUNTS = """
+SELECT item_key, choice_key, COUNT(*) FROM votes WHERE game_key = ?
+GROUP BY item_key, choice_key
+"""
+
+
+class SqliteDatabase(Database):
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        with self._connection() as db:
+            db.executescript(_SCHEMA)
+            columns = {column for _, column, *_ in db.execute("PRAGMA table_info(games)")}
+            for column in ("version", "metadata_version"):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE games ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        # Metadata only changes in save_game, so it is kept as long as the game's metadata_version says so
+        self._metadata_cache: dict[Key, tuple[int, GameMetadata]] = {}
+
+    def save_game(self, game: Game) -> None:
+        forget(self, game.key)
+        with self._connection() as db:
+            db.execute(
+                "INSERT INTO games (key, name, css, version, metadata_version) VALUES (?, ?, ?, 1, 1) "
+                "ON CONFLICT (key) DO UPDATE SET name = excluded.name, css = excluded.css, version = version + 1, "
+                "metadata_version = metadata_version + 1",
+                (game.key, game.name, game.css),
+            )
+            db.execute("DELETE FROM items WHERE game_key = ?", (game.key,))
+            db.executemany(
+                "INSERT INTO items (game_key, key, position, icon, title, text, image_url) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (game.key, item.key, position, item.icon, item.title, item.text, item.image_url)
+                    for position, item in enumerate(game.items)
+                ],
+            )
+            db.executemany(
+                "INSERT INTO choices (game_key, item_key, key, position, text, value) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (game.key, item.key, choice.key, position, choice.text, choice.value)
+                    for item in game.items
+                    for position, choice in enumerate(item.options)
+                ],
+            )
+            db.executemany(
+                "INSERT INTO players (game_key, name) VALUES (?, ?) ON CONFLICT DO NOTHING",
+                [(game.key, player.name) for player in game.players],
+            )
+            db.executemany(
+                "INSERT INTO votes (game_key, player_name, item_key, choice_key) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT DO UPDATE SET choice_key = excluded.choice_key",
+                [
+                    (game.key, player.name, item_key, vote_key)
+                    for player in game.players
+                    for item_key, vote_key in player.votes.items()
+                ],
+            )
+
+    def load_game(self, key: Key) -> Game:
+        # Within a request a game is queried once. Writes made through this database during the request are
+        # applied to the loaded game as well.
+        if game := mapped_game(self, key):
+            return game
+        with self._connection() as db:
+            metadata = self._metadata(db, key)
+            votes: dict[Name, dict[Key, Key]] = {
+                name: {} for (name,) in db.execute("SELECT name FROM players WHERE game_key = ? ORDER BY rowid", (key,))
+            }
+            for player_name, item_key, choice_key in db.execute(
+                "SELECT player_name, item_key, choice_key FROM votes WHERE game_key = ?",
+                (key,),
+            ):
+                votes[player_name][item_key] = choice_key
+        # the rows were validated on the way in
+        return remember(self, Game.from_trusted(metadata | {
+            "players": [{"name": name, "votes": player_votes} for name, player_votes in votes.items()],
+        }))
+
+    def load_game_metadata(self, key: Key) -> GameMetadata:
+        if game := mapped(self, key):
+            return game
+        with self._connection() as db:
+            row = db.execute("SELECT metadata_version FROM games WHERE key = ?", (key,)).fetchone()
+            if not row:
+                raise GameNotFoundError(key)
+            cached = self._metadata_cache.get(key)
+            if cached and cached[0] == row[0]:
+                return remember(self, cached[1])
+            metadata = GameMetadata.model_validate(self._metadata(db, key))
+        self._metadata_cache[key] = (row[0], metadata)
+        return remember(self, metadata)
+
+    def load_player(self, key: Key, player_name: Name) -> Player:
+        if game := mapped_game(self, key):
+            if player := game.player(player_name):
+                return player
+            raise PlayerNotFoundError(player_name, game.name)
+        with self._connection() as db:
+            if not db.execute(
+                "SELECT 1 FROM players WHERE game_key = ? AND name = ?",
+                (key, player_name),
+            ).fetchone():
+                raise PlayerNotFoundError(player_name, self._game_name(db, key))
+            votes = db.execute(
+                "SELECT item_key, choice_key FROM votes WHERE game_key = ? AND player_name = ?",
+                (key, player_name),
+            )
+            return Player(name=player_name, votes=dict(votes.fetchall()))
+
+    def join_game(self, key: Key, player_name: Name, *, join_as_existing: bool = False) -> Player:
+        with self._connection() as db:
+            game_name = self._game_name(db, key)
+            try:
+                db.execute("INSERT INTO players (game_key, name) VALUES (?, ?)", (key, player_name))
+            except sqlite3.IntegrityError:
+                if not join_as_existing:
+                    raise PlayerAlreadyExistsError(game_name, player_name) from None
+                votes = db.execute(
+                    "SELECT item_key, choice_key FROM votes WHERE game_key = ? AND player_name = ?",
+                    (key, player_name),
+                )
+                return Player(name=player_name, votes=dict(votes.fetchall()))
+            db.execute(_BUMP_VERSION, (key,))
+        player = Player.new(name=player_name)
+        if game := mapped_game(self, key):
+            game.add_player(player)
+        return player
+
+    def vote(self, player_name: Name, game_key: Key, item_key: Key, vote_key: Key) -> None:
+        if error := self.vote_many(game_key, [(player_name, item_key, vote_key)])[0]:
+            raise error
+
+    def vote_many(self, game_key: Key, votes: Sequence[Vote]) -> list[DatabaseError | None]:
+        # one transaction and so one commit for the whole batch, a failing vote only rolls back its own statement
+        with self._connection() as db:
+            game_name = self._game_name(db, game_key)
+            errors = [self._vote(db, game_key, game_name, vote) for vote in votes]
+            if None in errors:
+                db.execute(_BUMP_VERSION, (game_key,))
+        if game := mapped_game(self, game_key):
+            for (player_name, item_key, vote_key), error in zip(votes, errors, strict=True):
+                if error is None and (player := game.player(player_name)):
+                    game.set_vote(player, item_key, vote_key)
+        return errors
+
+    def game_version(self, key: Key) -> int:
+        with self._connection() as db:
+            row = db.execute("SELECT version FROM games WHERE key = ?", (key,)).fetchone()
+        if not row:
+            raise GameNotFoundError(key)
+        return int(row[0])
+
+    def game_keys(self) -> list[Key]:
+        # newest games first, there is no record of when a game was last played
+        with self._connection() as db:
+            return [key for (key,) in db.execute("SELECT key FROM games ORDER BY rowid DESC")]
+
+    def results(self, key: Key) -> list[ItemResult]:
+        # A game loaded in this request already has the tallies, otherwise only the votes get counted
+        if game := mapped_game(self, key):
+            return game.results()
+        metadata = self.load_game_metadata(key)
+        counts: dict[Key, dict[Key, int]] = {}
+        with self._connection() as db:
+            for item_key, choice_key, count in db.execute(_VOTE_COUNTS, (key,)):
+                counts.setdefault(item_key, {})[choice_key] = count
+        return metadata.results_from_counts(counts)
+
+    def close(self) -> None:
+        # closing the last connection checkpoints the write-ahead log into the database file
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    @staticmethod
+    def _vote(db: sqlite3.Connection, game_key: Key, game_name: str, vote: Vote) -> DatabaseError | None:
+        player_name, item_key, vote_key = vote
+        try:
+            cursor = db.execute(_VOTE, {
+                "player_name": player_name,
+                "game_key": game_key,
+                "item_key": item_key,
+                "vote_key": vote_key,
+            })
+        except sqlite3.IntegrityError:
+            return PlayerNotFoundError(player_name, game_name)
+        if cursor.rowcount:
+            return None
+        # Nothing was written, find out what was wrong with the vote
+        if db.execute("SELECT 1 FROM items WHERE game_key = ? AND key = ?", (game_key, item_key)).fetchone():
+            return ChoiceNotFoundError(vote_key, item_key, game_name)
+        return VoteItemNotFoundError(item_key, game_name)
+
+    @staticmethod
+    def _metadata(db: sqlite3.Connection, key: Key) -> dict[str, object]:
+        row = db.execute("SELECT name, css FROM games WHERE key = ?", (key,)).fetchone()
+        if not row:
+            raise GameNotFoundError(key)
+        options: dict[Key, list[dict[str, object]]] = {}
+        for item_key, choice_key, text, value in db.execute(
+            "SELECT item_key, key, text, value FROM choices WHERE game_key = ? ORDER BY item_key, position",
+            (key,),
+        ):
+            options.setdefault(item_key, []).append({"key": choice_key, "text": text, "value": value})
+        items = [
+            {
+                "key": item_key,
+                "icon": icon,
+                "title": title,
+                "text": text,
+                "image_url": image_url,
+                "options": options.get(item_key, []),
+            }
+            for item_key, icon, title, text, image_url in db.execute(
+                "SELECT key, icon, title, text, image_url FROM items WHERE game_key = ? ORDER BY position",
+                (key,),
+            )
+        ]
+        return {"key": key, "name": row[0], "css": row[1], "items": items}
+
+    @staticmethod
+    def _game_name(db: sqlite3.Connection, key: Key) -> str:
+        row = db.execute("SELECT name FROM games WHERE key = ?", (key,)).fetchone()
+        if not row:
+            raise GameNotFoundError(key)
+        return str(row[0])
+
+    def _connection(self) -> sqlite3.Connection:
+        # Used as a context manager the connection commits when the block succeeds and rolls back when it raises.
+        # sqlite connections can't be shared between threads, and FastAPI serves requests from a thread pool. Each
+        # connection is only used by its own thread, but closed by whichever thread closes the database.
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            # A vote is on disk when the call returns, NORMAL would skip the fsync at commit under WAL. Grouping the
+            # votes into one commit per batch (BatchingAsyncDatabase) is what pays for the fsync.
+            connection.execute("PRAGMA synchronous = FULL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
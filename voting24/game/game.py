@@ -1,7 +1,11 @@
+import math
 import re
-from typing import Annotated, TypeVar
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Annotated, Any, TypeVar
 
-from pydantic import AfterValidator, Field
+from pydantic import AfterValidator, Field, PrivateAttr, TypeAdapter, model_validator
+from pydantic_core import from_json
 
 from voting24.game.model import Model
 
@@ -47,6 +51,13 @@ class VoteItem(Model):
     image_url: Text | None = None
     options: UniqueList[Choice]
 
+    _choices_by_key: Mapping[Key, Choice] = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode="after")
+    def _rebuild_indexes(self) -> "VoteItem":
+        self._choices_by_key = {choice.key: choice for choice in self.options}
+        return self
+
     @classmethod
     def new(  # noqa: PLR0913  # this is a convenience constsructor
         cls,
@@ -71,6 +82,12 @@ class VoteItem(Model):
     def __eq__(self, other: object) -> bool:
         return isinstance(other, VoteItem) and self.key == other.key
 
+    def choice(self, key: Key) -> Choice | None:
+        return self._choices_by_key.get(key)
+
+
+_vote_items = TypeAdapter(list[VoteItem])
+
 
 class Player(Model):
     name: Name
@@ -80,14 +97,179 @@ class Player(Model):
     def new(cls, name: Text) -> "Player":
         return Player(name=name, votes={})
 
+    @classmethod
+    def from_trusted(cls, data: Mapping[str, Any]) -> "Player":
+        return cls.model_construct(**data)
+
+    @classmethod
+    def from_trusted_json(cls, json_data: str | bytes) -> "Player":
+        return cls.from_trusted(from_json(json_data))
+
+
+@dataclass
+class ItemTally:
+    score: Value = 0
+    count: int = 0
+    choices: dict[Key, int] = field(default_factory=dict)
+    # sum of the squared values, for the variance
+    squares: int = 0
+
+    def add(self, choice: Choice) -> None:
+        self.score += choice.value
+        self.count += 1
+        self.choices[choice.key] = self.choices.get(choice.key, 0) + 1
+        self.squares += choice.value**2
+
+    def remove(self, choice: Choice) -> None:
+        self.score -= choice.value
+        self.count -= 1
+        self.choices[choice.key] -= 1
+        self.squares -= choice.value**2
+
+
+@dataclass
+class ItemResult:
+    item: VoteItem
+    score: Value
+    count: int
+    # number of votes per choice, in the order of the item's options
+    histogram: dict[Key, int]
+    # 1 for the highest score, items with the same score share the rank
+    rank: int
+    squares: int = 0
+
+    @property
+    def mean(self) -> float:
+        return self.score / self.count if self.count else 0.0
+
+    @property
+    def variance(self) -> float:
+        if not self.count:
+            return 0.0
+        # rounding may take it just below zero when everyone voted the same
+        return max(self.squares / self.count - self.mean**2, 0.0)
+
+    @property
+    def controversy(self) -> float:
+        # The standard deviation relative to the largest one possible, which is when the votes are split evenly between
+        # the lowest and the highest choice: 0 when everyone agrees, 1 when the voters are split between the extremes
+        values = [choice.value for choice in self.item.options]
+        half_range = (max(values) - min(values)) / 2 if values else 0
+        return min(math.sqrt(self.variance) / half_range, 1.0) if half_range else 0.0
+
 
-class Game(Model):
+class GameMetadata(Model):
+    # Everything about a game except its players, for the pages that don't need to know who is playing
     key: Key
     name: Text
     css: Text | None = None
     items: UniqueList[VoteItem]
+
+    _item_positions: Mapping[Key, int] = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode="after")
+    def _index_items(self) -> "GameMetadata":
+        self._build_item_positions()
+        return self
+
+    def _build_item_positions(self) -> None:
+        self._item_positions = {item.key: index for index, item in enumerate(self.items)}
+
+    def item(self, item_key: Key) -> VoteItem | None:
+        index = self._item_positions.get(item_key)
+        return self.items[index] if index is not None else None
+
+    def previous_item(self, item: VoteItem) -> VoteItem | None:
+        index = self._item_positions[item.key]
+        if index > 0:
+            return self.items[index - 1]
+        return None
+
+    def next_item(self, item: VoteItem) -> VoteItem | None:
+        index = self._item_positions[item.key]
+        if index < len(self.items) - 1:
+            return self.items[index + 1]
+        return None
+
+    def is_last_item(self, item: VoteItem) -> bool:
+        return self._item_positions[item.key] == len(self.items) - 1
+
+    def first_unvoted_item(self, player: Player | None) -> Key | None:
+        votes = player.votes if player else {}
+        for item in self.items:
+            if item.key not in votes:
+                return item.key
+        return None
+
+    def results_from_counts(self, counts: Mapping[Key, Mapping[Key, int]]) -> list[ItemResult]:
+        # For backends that count the votes per item and choice themselves, votes for unknown choices don't count
+        results: list[ItemResult] = []
+        for item in self.items:
+            item_counts = counts.get(item.key, {})
+            histogram = {choice.key: item_counts.get(choice.key, 0) for choice in item.options}
+            results.append(ItemResult(
+                item,
+                score=sum(choice.value * histogram[choice.key] for choice in item.options),
+                count=sum(histogram.values()),
+                histogram=histogram,
+                rank=0,
+                squares=sum(choice.value**2 * histogram[choice.key] for choice in item.options),
+            ))
+        return _ranked(results)
+
+    def _choice(self, item_key: Key, vote_key: Key | None) -> Choice | None:
+        if not vote_key:
+            return None
+        item = self.item(item_key)
+        return item.choice(vote_key) if item else None
+
+
+class Game(GameMetadata):
     players: list[Player]
 
+    # Lookups and running per-item totals so that the hot paths do not need to go through every player.
+    # Rebuilt whenever the model is validated, kept up to date by add_player() and set_vote() afterwards.
+    _players_by_name: dict[Name, Player] = PrivateAttr(default_factory=dict)
+    _tallies: dict[Key, ItemTally] = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode="after")
+    def _rebuild_indexes(self) -> "Game":
+        self._build_players_and_tallies()
+        return self
+
+    def _build_players_and_tallies(self) -> None:
+        players_by_name: dict[Name, Player] = {}
+        for player in self.players:
+            players_by_name.setdefault(player.name, player)
+        # private attributes are slow to get at, so the loop over all votes only uses local dicts
+        choices = {item.key: item._choices_by_key for item in self.items}  # noqa: SLF001
+        tallies = {item.key: ItemTally() for item in self.items}
+        for player in self.players:
+            for item_key, vote_key in player.votes.items():
+                if (item_choices := choices.get(item_key)) and (choice := item_choices.get(vote_key)):
+                    tallies[item_key].add(choice)
+        self._players_by_name = players_by_name
+        self._tallies = tallies
+
+    # Validating a game checks the key of every vote of every player against its pattern, which takes most of the
+    # time of loading large games. Players the app has stored itself were validated when they were saved, so they are
+    # built as is. The items are validated anyway, pydantic does that faster than building them one by one in Python.
+    # Anything from outside goes through model_validate as usual.
+    @classmethod
+    def from_trusted(cls, data: Mapping[str, Any]) -> "Game":
+        game = cls.model_construct(**{
+            **data,
+            "items": _vote_items.validate_python(data["items"]),
+            "players": [Player.from_trusted(player) for player in data.get("players", [])],
+        })
+        cls._build_item_positions(game)
+        cls._build_players_and_tallies(game)
+        return game
+
+    @classmethod
+    def from_trusted_json(cls, json_data: str | bytes) -> "Game":
+        return cls.from_trusted(from_json(json_data))
+
     @staticmethod
     def new(name: Text, key: Key | None = None) -> "Game":
         return Game(
@@ -98,46 +280,56 @@ class Game(Model):
         )
 
     def points(self) -> dict[VoteItem, Value]:
-        return {
-            item: sum(
-                next(choice.value for choice in item.options if choice.key == itemkey)
-                for itemkey
-                in [player.votes[item.key] for player in players]
-            )
-            for item, players
-            in self.votes().items()
-        }
+        return {item: self._tallies[item.key].score for item in self.items}
 
-    def votes(self) -> dict[VoteItem, list[Player]]:
-        return {
-            item: [
-                player
-                for player
-                in self.players
-                if player.votes.get(item.key)
-            ]
-            for item
-            in self.items
-        }
+    def tally(self) -> dict[VoteItem, ItemTally]:
+        return {item: self._tallies[item.key] for item in self.items}
 
-    def next_unvoted_item(self, player_name: Name) -> Key | None:
-        votes = next((player.votes for player in self.players if player.name == player_name), {})
+    def add_player(self, player: Player) -> None:
+        if player.name in self._players_by_name:
+            message = f"Player {player.name} is already in game {self.key}"
+            raise ValueError(message)
+        self.players.append(player)
+        self._players_by_name[player.name] = player
+        for item_key, vote_key in player.votes.items():
+            if choice := self._choice(item_key, vote_key):
+                self._tallies[item_key].add(choice)
+
+    def set_vote(self, player: Player, item_key: Key, vote_key: Key) -> None:
+        if previous := self._choice(item_key, player.votes.get(item_key)):
+            self._tallies[item_key].remove(previous)
+        player.votes[item_key] = vote_key
+        if choice := self._choice(item_key, vote_key):
+            self._tallies[item_key].add(choice)
+
+    def results(self) -> list[ItemResult]:
+        # Everything the results page shows, in item order, straight from the tallies
+        results: list[ItemResult] = []
         for item in self.items:
-            if item.key not in votes:
-                return item.key
-        return None
+            tally = self._tallies[item.key]
+            histogram = {choice.key: tally.choices.get(choice.key, 0) for choice in item.options}
+            results.append(ItemResult(item, tally.score, tally.count, histogram, rank=0, squares=tally.squares))
+        return _ranked(results)
 
-    def previous_item(self, item: VoteItem) -> VoteItem | None:
-        index = self.items.index(item)
-        if index > 0:
-            return self.items[index - 1]
-        return None
+    def votes(self) -> dict[VoteItem, list[Player]]:
+        # one pass over the votes of every player rather than over every player once per item
+        voters: dict[Key, list[Player]] = {item.key: [] for item in self.items}
+        for player in self.players:
+            for item_key, vote_key in player.votes.items():
+                if vote_key and item_key in voters:
+                    voters[item_key].append(player)
+        return {item: voters[item.key] for item in self.items}
 
-    def next_item(self, item: VoteItem) -> VoteItem | None:
-        index = self.items.index(item)
-        if index < len(self.items) - 1:
-            return self.items[index + 1]
-        return None
+    def next_unvoted_item(self, player_name: Name) -> Key | None:
+        return self.first_unvoted_item(self._players_by_name.get(player_name))
 
     def player(self, player_name: Name) -> Player | None:
-        return next((player for player in self.players if player.name == player_name), None)
+        return self._players_by_name.get(player_name)
+
+
+def _ranked(results: list[ItemResult]) -> list[ItemResult]:
+    previous: ItemResult | None = None
+    for position, result in enumerate(sorted(results, key=lambda result: -result.score), start=1):
+        result.rank = previous.rank if previous and previous.score == result.score else position
+        previous = result
+    return results
@@ -0,0 +1,60 @@
+import threading
+
+
+class Counter:
+    def __init__(self) -> None:
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+
+class Summary:
+    # count, sum and max of the observed values, enough for averages without keeping the samples around
+
+    def __init__(self) -> None:
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {"count": self._count, "sum": self._sum, "max": self._max}
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._counters: dict[str, Counter] = {}
+        self._summaries: dict[str, Summary] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            return self._counters.setdefault(name, Counter())
+
+    def summary(self, name: str) -> Summary:
+        with self._lock:
+            return self._summaries.setdefault(name, Summary())
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            values: dict[str, float] = {name: counter.value for name, counter in self._counters.items()}
+            for name, summary in self._summaries.items():
+                values.update({f"{name}.{field}": value for field, value in summary.snapshot().items()})
+        return dict(sorted(values.items()))
+
+
+metrics = Metrics()
@@ -1,14 +1,44 @@
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from .routes import game, play
+from .dependencies import async_database_for, close_async_database, create_database
+from .middleware import IdempotencyMiddleware, IdentityMapMiddleware
+from .routes import api, game, health, metrics, play
+from .static import npm_scripts
 from .ui import script_router, style_router
+from .warmup import start_warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    # The database lives as long as the app, its caches and vote batches are shared by all requests
+    npm_scripts.load()
+    app.state.database = create_database()
+    warmup = start_warm_up(app, async_database_for(app.state.database))
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        app.state.ready = False
+        await close_async_database(app.state.database)
+
 
 app = FastAPI(
     title="Voting app 2024",
     version="0.0.1",
+    lifespan=lifespan,
 )
 
+app.add_middleware(IdentityMapMiddleware)
+# outermost, a retried request is answered before anything else runs
+app.add_middleware(IdempotencyMiddleware)
+
 app.include_router(style_router)
 app.include_router(script_router)
 app.include_router(game.router)
 app.include_router(play.router)
+app.include_router(api.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
@@ -0,0 +1,210 @@
+"""Compile the stylesheets under ui/styles into ui/dist, named by a hash of their content, and write a manifest
+mapping every stylesheet to its compiled file. Run it as part of the deployment, the app serves the files listed in
+the manifest and only compiles stylesheets on request in dev mode (ASSETS_DEV=1).
+
+    poetry run python -m voting24.web.assets build
+"""
+import argparse
+import hashlib
+import json
+import logging
+import subprocess  # noqa: S404
+import tempfile
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from os import environ
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+_logger = logging.getLogger(__name__)
+
+ui_path = Path(__file__).parent.parent.parent / "ui"
+dist_path = ui_path / "dist"
+cache_path = ui_path / ".cache"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class SassError(Exception):
+    pass
+
+
+@dataclass
+class CompiledCss:
+    css: str
+    # every file that went into the css, from the source map
+    sources: list[Path]
+
+
+def compile_scss(file_path: Path) -> CompiledCss:
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = Path(tmp) / "output.css"
+        result = subprocess.run(
+            [  # noqa: S603  # it's not untrusted content
+                "/usr/bin/npx",
+                "sass",
+                "--source-map-urls=absolute",
+                str(file_path),
+                str(output_path),
+            ],
+            capture_output=True,
+            text=True,
+            cwd=str(ui_path),
+            check=False,
+        )
+        if result.returncode != 0:
+            raise SassError(result.stderr)
+        css = output_path.read_text(encoding="utf-8")
+        source_map = json.loads(output_path.with_suffix(".css.map").read_text(encoding="utf-8"))
+    # drop the reference to the map, it was only written to find out the imports
+    css = "".join(line for line in css.splitlines(keepends=True) if not line.startswith("/*# sourceMappingURL="))
+    sources = [
+        Path(url2pathname(url.path))
+        for url in map(urlparse, source_map.get("sources", []))
+        if url.scheme == "file"
+    ]
+    return CompiledCss(css, sources)
+
+
+@dataclass
+class _CacheEntry:
+    css: str
+    # modification times of the imported files when the css was compiled
+    sources: dict[str, int | None]
+
+    def is_fresh(self) -> bool:
+        return all(_mtime(Path(source)) == mtime for source, mtime in self.sources.items())
+
+
+class CompileCache:
+    # Stylesheets compiled on request in dev mode. Concurrent requests for a stylesheet wait for one sass run, and a
+    # compiled stylesheet is used until any file it imports changes. Entries are also kept on disk, so that
+    # restarting the server does not mean compiling everything again.
+
+    def __init__(
+        self,
+        source_path: Path,
+        cache_path: Path,
+        compiler: Callable[[Path], CompiledCss] = compile_scss,
+    ) -> None:
+        self.source_path = source_path
+        self.cache_path = cache_path
+        self.compiler = compiler
+        self._entries: dict[Path, _CacheEntry] = {}
+        self._locks: dict[Path, threading.Lock] = {}
+
+    def get(self, file_path: Path) -> str:
+        with self._locks.setdefault(file_path, threading.Lock()):
+            entry = self._entries.get(file_path) or self._read(file_path)
+            if entry is None or not entry.is_fresh():
+                entry = self._compile(file_path)
+            self._entries[file_path] = entry
+            return entry.css
+
+    def _compile(self, file_path: Path) -> _CacheEntry:
+        _logger.info("Compiling %s", file_path)
+        # take the modification times first, so that edits made during the compilation count as changes
+        sources = {str(self.source_path / file_path): _mtime(self.source_path / file_path)}
+        compiled = self.compiler(file_path)
+        sources.update({str(source): _mtime(source) for source in compiled.sources if str(source) not in sources})
+        entry = _CacheEntry(compiled.css, sources)
+        entry_path = self._entry_path(file_path)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        entry_path.write_text(json.dumps({"css": entry.css, "sources": entry.sources}), encoding="utf-8")
+        return entry
+
+    def _read(self, file_path: Path) -> _CacheEntry | None:
+        try:
+            stored = json.loads(self._entry_path(file_path).read_text(encoding="utf-8"))
+            return _CacheEntry(stored["css"], stored["sources"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _entry_path(self, file_path: Path) -> Path:
+        return self.cache_path / file_path.with_suffix(".json")
+
+
+def _mtime(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def build(
+    source_path: Path,
+    output_path: Path,
+    compiler: Callable[[Path], CompiledCss] = compile_scss,
+) -> dict[str, str]:
+    (output_path / "css").mkdir(parents=True, exist_ok=True)
+    files: dict[str, str] = {}
+    for source in sorted((source_path / "styles").glob("*.scss")):
+        if source.name.startswith("_"):
+            continue  # partials only exist to be imported
+        css = compiler(source.relative_to(source_path)).css
+        digest = hashlib.sha256(css.encode()).hexdigest()[:12]
+        files[f"{source.stem}.css"] = f"{source.stem}.{digest}.css"
+        (output_path / "css" / files[f"{source.stem}.css"]).write_text(css, encoding="utf-8")
+    (output_path / "manifest.json").write_text(json.dumps(files, indent=2), encoding="utf-8")
+    return files
+
+
+def dev_mode() -> bool:
+    return environ.get("ASSETS_DEV", "") not in {"", "0"}
+
+
+class Manifest:
+    # The compiled stylesheets of the latest build, read once and kept in memory
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._files: dict[str, str] | None = None
+        self._contents: dict[str, bytes] = {}
+
+    @property
+    def files(self) -> dict[str, str]:
+        if self._files is None:
+            try:
+                self._files = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                _logger.warning("No compiled assets in %s, run python -m voting24.web.assets build", self.path)
+                self._files = {}
+        return self._files
+
+    def url(self, name: str) -> str:
+        if dev_mode():
+            return f"/css/{name}"
+        return f"/css/{self.files.get(name, name)}"
+
+    def content(self, file_name: str) -> bytes | None:
+        if file_name not in self._contents:
+            if file_name not in self.files.values():
+                return None
+            self._contents[file_name] = (self.path / "css" / file_name).read_bytes()
+        return self._contents[file_name]
+
+
+manifest = Manifest(dist_path)
+
+
+def asset_url(name: str) -> str:
+    return manifest.url(name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build"])
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        files = build(ui_path, dist_path)
+    except SassError as e:
+        raise SystemExit(str(e)) from None
+    for name, file_name in files.items():
+        _logger.info("%s -> %s", name, file_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import secrets
+from collections.abc import Mapping
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from voting24.game.game import Key
+
+# Versions start over when an in-memory database is recreated and the templates change between deployments, so the
+# tag also names the process that rendered the page
+_instance = secrets.token_hex(4)
+
+
+def game_etag(key: Key, version: int) -> str:
+    return f'"{key}-{version}-{_instance}"'
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    # no-cache lets browsers keep the page but makes them revalidate it every time
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(
+    request: Request,
+    etag: str,
+    headers: Mapping[str, str] | None = None,
+    last_modified: datetime | None = None,
+) -> Response | None:
+    if _is_fresh(request, etag, last_modified):
+        return Response(status_code=304, headers=headers or cache_headers(etag))
+    return None
+
+
+def _is_fresh(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    # If-Modified-Since only counts when there is no If-None-Match
+    if if_none_match := request.headers.get("if-none-match"):
+        return _matches(if_none_match, etag)
+    if last_modified and (if_modified_since := request.headers.get("if-modified-since")):
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixed tags added by proxies still match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
@@ -2,18 +2,26 @@ import logging
 from collections.abc import Mapping
 from os import environ
 from pathlib import Path
-from typing import Any, Protocol
+from typing import Annotated, Any, Protocol
 
-from fastapi import BackgroundTasks, Request
+from fastapi import BackgroundTasks, Depends, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from starlette.background import BackgroundTask
 
+from voting24.db.async_database import AsyncDatabase, BatchingAsyncDatabase, ThreadedAsyncDatabase
 from voting24.db.database import Database
 from voting24.db.file_database import FileDatabase
 from voting24.db.hardcoded_eurovision24_game import hardcoded_datatabase
+from voting24.db.sqlite_database import SqliteDatabase
+from voting24.web.assets import asset_url
+from voting24.web.static import script_url
 
 _templates = Jinja2Templates(directory="voting24/web/templates")
+_templates.env.globals["asset_url"] = asset_url
+_templates.env.globals["script_url"] = script_url
+# the wrappers hold on to their databases, so an entry only goes away with close_async_database
+_async_databases: dict[Database, AsyncDatabase] = {}
 
 
 class TemplateResponse(Protocol):
@@ -29,17 +37,83 @@ class TemplateResponse(Protocol):
         ...
 
 
-def get_database() -> Database:
+# The dependencies do not block, so they are async to keep them from taking up a thread from the pool
+async def get_database(request: Request) -> Database:
+    # created once by the lifespan of the app, see create_database
+    database: Database = request.app.state.database
+    return database
+
+
+async def get_async_database(database: Annotated[Database, Depends(get_database)]) -> AsyncDatabase:
+    return async_database_for(database)
+
+
+def create_database() -> Database:
+    if db_file := environ.get("DATABASE_SQLITE"):
+        return _sqlite_database(db_file)
     if db_dir := environ.get("DATABASE_DIR"):
-        logging.info("Using file database with directory %s", db_dir)
-        db_path = Path(db_dir)
-        if not db_path.exists():
-            db_path.mkdir(parents=True)
-        return FileDatabase(db_path)
+        return _file_database(db_dir, journal=environ.get("DATABASE_JOURNAL", "") not in {"", "0"})
     return hardcoded_datatabase
 
 
-def template(request: Request) -> TemplateResponse:
+def async_database_for(database: Database) -> AsyncDatabase:
+    # one wrapper per database so that all requests share its concurrency limit and vote batches
+    if (async_database := _async_databases.get(database)) is None:
+        async_database = ThreadedAsyncDatabase(
+            database,
+            max_concurrency=int(environ.get("DATABASE_CONCURRENCY", "16")),
+            max_write_concurrency=int(environ.get("DATABASE_WRITE_CONCURRENCY", "4")),
+        )
+        if (batch_window_ms := float(environ.get("VOTE_BATCH_WINDOW_MS", "0"))) and _writes_batches_at_once(database):
+            async_database = BatchingAsyncDatabase(async_database, batch_window_ms / 1000)
+        _async_databases[database] = async_database
+    return async_database
+
+
+async def close_async_database(database: Database) -> None:
+    # writes the pending vote batches and closes the database
+    if (async_database := _async_databases.pop(database, None)) is not None:
+        await async_database.close()
+
+
+def _writes_batches_at_once(database: Database) -> bool:
+    # Without the journal the file database writes every player of a batch to its own file, so waiting for the batch
+    # would only make the votes slower
+    if isinstance(database, FileDatabase) and not database.journal:
+        logging.warning("VOTE_BATCH_WINDOW_MS only applies to SQLite and DATABASE_JOURNAL=1, ignoring it")
+        return False
+    return True
+
+
+def precompile_templates() -> int:
+    # Jinja keeps the compiled templates, so the first requests don't have to wait for the compiler
+    names = _templates.env.list_templates()
+    for name in names:
+        _templates.env.get_template(name)
+    return len(names)
+
+
+def _file_database(db_dir: str, *, journal: bool) -> FileDatabase:
+    logging.info("Using file database with directory %s", db_dir)
+    db_path = Path(db_dir)
+    if not db_path.exists():
+        db_path.mkdir(parents=True)
+    return FileDatabase(db_path, journal=journal)
+
+
+def _sqlite_database(db_file: str) -> SqliteDatabase:
+    logging.info("Using SQLite database %s", db_file)
+    db_path = Path(db_file)
+    if not db_path.parent.exists():
+        db_path.parent.mkdir(parents=True)
+    return SqliteDatabase(db_path)
+
+
+def render_template(template: str, context: dict[str, Any]) -> str:
+    return _templates.get_template(template).render(context)
+
+
+async def template(request: Request) -> TemplateResponse:
     def respond(  # noqa: PLR0913, PLR0917
         template: str,
         context: dict[str, Any] | None = None,
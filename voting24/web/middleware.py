@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from voting24.db.identity_map import request_scope
+from voting24.metrics import metrics
+
+_hits = metrics.counter("idempotency.hits")
+_misses = metrics.counter("idempotency.misses")
+
+
+class IdentityMapMiddleware:
+    # Gives every request its own identity map, so that each game is loaded at most once per request
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_scope():
+            await self.app(scope, receive, send)
+
+
+@dataclass
+class _Response:
+    messages: list[Message]
+    expires: float
+
+
+class IdempotencyMiddleware:
+    # Answers a POST that repeats the Idempotency-Key header, player, path and body of an earlier one with the
+    # response of the earlier one, without running it again, so that clients can retry votes and joins safely and
+    # the retries never reach the database. The responses are kept in memory for ttl seconds and the oldest are
+    # dropped beyond max_entries. A retry that arrives while the first request is still running waits for it. Server
+    # errors and responses larger than max_body are not kept, the next retry runs again.
+
+    def __init__(self, app: ASGIApp, ttl: float = 300, max_entries: int = 10_000, max_body: int = 64 * 1024) -> None:
+        self.app = app
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self._responses: OrderedDict[tuple[bytes, ...], _Response] = OrderedDict()
+        self._running: dict[tuple[bytes, ...], asyncio.Future[None]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not (idempotency_key := headers.get(b"idempotency-key")):
+            await self.app(scope, receive, send)
+            return
+        body = await _read_body(receive)
+        if body is None:
+            return
+        player_name = cookie_parser(headers.get(b"cookie", b"").decode("latin-1")).get("player_name", "")
+        key = (idempotency_key, player_name.encode(), scope["path"].encode(), hashlib.sha256(body).digest())
+        while (running := self._running.get(key)) is not None:
+            await asyncio.shield(running)
+        if (response := self._get(key)) is not None:
+            _hits.inc()
+            await _replay(response, send)
+            return
+        _misses.inc()
+        self._running[key] = asyncio.get_running_loop().create_future()
+        try:
+            messages = await self._record(scope, _receive_body(body, receive), send)
+            if messages is not None:
+                self._put(key, messages)
+        finally:
+            self._running.pop(key).set_result(None)
+
+    async def _record(self, scope: Scope, receive: Receive, send: Send) -> list[Message] | None:
+        messages: list[Message] = []
+        size = 0
+
+        async def record(message: Message) -> None:
+            nonlocal size
+            if message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            messages.append(message)
+            await send(message)
+
+        await self.app(scope, receive, record)
+        if not messages or messages[0]["status"] >= 500 or size > self.max_body:  # noqa: PLR2004
+            return None
+        return messages
+
+    def _get(self, key: tuple[bytes, ...]) -> _Response | None:
+        response = self._responses.get(key)
+        if response is None or response.expires < time.monotonic():
+            return None
+        return response
+
+    def _put(self, key: tuple[bytes, ...], messages: list[Message]) -> None:
+        now = time.monotonic()
+        self._responses[key] = _Response(messages, now + self.ttl)
+        # all entries live equally long, so the oldest is always the first to expire
+        while self._responses and (
+            len(self._responses) > self.max_entries or next(iter(self._responses.values())).expires < now
+        ):
+            self._responses.popitem(last=False)
+
+
+async def _read_body(receive: Receive) -> bytes | None:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _receive_body(body: bytes, receive: Receive) -> Receive:
+    received = False
+
+    async def receive_body() -> Message:
+        nonlocal received
+        if received:
+            return await receive()
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return receive_body
+
+
+async def _replay(response: _Response, send: Send) -> None:
+    start, *body = response.messages
+    await send({**start, "headers": [*start.get("headers", []), (b"idempotent-replayed", b"true")]})
+    for message in body:
+        await send(message)
@@ -0,0 +1,111 @@
+import asyncio
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from weakref import WeakKeyDictionary
+
+from pydantic import BaseModel
+
+from voting24.db.async_database import AsyncDatabase
+from voting24.game.game import GameMetadata, ItemResult, Key, Value
+from voting24.metrics import metrics
+
+_builds = metrics.counter("results_cache.builds")
+_hits = metrics.counter("results_cache.hits")
+
+
+class ItemScore(BaseModel):
+    key: Key
+    title: str
+    score: Value
+    count: int
+    rank: int
+
+    @classmethod
+    def of(cls, result: ItemResult) -> "ItemScore":
+        return cls(
+            key=result.item.key,
+            title=result.item.title,
+            score=result.score,
+            count=result.count,
+            rank=result.rank,
+        )
+
+
+class GameResults(BaseModel):
+    key: Key
+    name: str
+    version: int
+    # the version the items changed since, None when all items are included
+    since: int | None = None
+    items: list[ItemScore]
+
+
+@dataclass
+class _Snapshot:
+    name: str
+    version: int
+    items: dict[Key, ItemScore]
+    body: bytes
+    # the serialized changes since older versions
+    deltas: dict[int, bytes] = field(default_factory=dict)
+
+
+class ResultsCache:
+    # The results of a game serialized once per version and kept as bytes, for clients that poll them all the time.
+    # The last few versions are remembered so that a client can ask for just the items that changed since the
+    # version it has, anything older gets all items.
+
+    def __init__(self, history: int = 64) -> None:
+        self.history = history
+        self._snapshots: WeakKeyDictionary[AsyncDatabase, dict[Key, OrderedDict[int, _Snapshot]]] = (
+            WeakKeyDictionary()
+        )
+        self._locks: defaultdict[Key, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def results(self, database: AsyncDatabase, key: Key, version: int, since: int | None = None) -> bytes:
+        snapshot = await self._snapshot(database, key, version)
+        if since is None:
+            return snapshot.body
+        older = snapshot if since == snapshot.version else self._snapshots[database][key].get(since)
+        if older is None:
+            return snapshot.body
+        return _delta(key, snapshot, older)
+
+    async def _snapshot(self, database: AsyncDatabase, key: Key, version: int) -> _Snapshot:
+        snapshots = self._snapshots.setdefault(database, {}).setdefault(key, OrderedDict())
+        if snapshot := snapshots.get(version):
+            _hits.inc()
+            return snapshot
+        # one request builds the new version, the others wait for it
+        async with self._locks[key]:
+            if snapshot := snapshots.get(version):
+                _hits.inc()
+                return snapshot
+            _builds.inc()
+            snapshot = _build(await database.load_game_metadata(key), await database.results(key), version)
+            snapshots[version] = snapshot
+            while len(snapshots) > self.history:
+                snapshots.popitem(last=False)
+            return snapshot
+
+
+def _build(game: GameMetadata, results: list[ItemResult], version: int) -> _Snapshot:
+    items = [ItemScore.of(result) for result in results]
+    body = GameResults(key=game.key, name=game.name, version=version, items=items).model_dump_json().encode()
+    return _Snapshot(game.name, version, {item.key: item for item in items}, body)
+
+
+def _delta(key: Key, snapshot: _Snapshot, older: _Snapshot) -> bytes:
+    # items whose score, count or rank changed, serialized once per pair of versions
+    if (delta := snapshot.deltas.get(older.version)) is None:
+        delta = snapshot.deltas[older.version] = GameResults(
+            key=key,
+            name=snapshot.name,
+            version=snapshot.version,
+            since=older.version,
+            items=[item for item_key, item in snapshot.items.items() if older.items.get(item_key) != item],
+        ).model_dump_json().encode()
+    return delta
+
+
+results_cache = ResultsCache()
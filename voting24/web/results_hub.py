@@ -0,0 +1,123 @@
+import asyncio
+import contextvars
+import logging
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+
+from voting24.db.async_database import AsyncDatabase
+from voting24.db.database import DatabaseError
+from voting24.game.game import GameMetadata, ItemResult, Key, Value
+from voting24.web.dependencies import render_template
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    no_sort: bool
+    fragment: str | None = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class ResultsHub:
+    # Pushes the results fragment of a game to everyone watching it. Votes only mark the game as changed, the
+    # results are checked at most once per interval and rendered once per sort order for all subscribers, and only
+    # when the points have actually changed since the last push.
+
+    def __init__(
+        self,
+        render: Callable[[GameMetadata, list[ItemResult], bool], str],
+        interval: float = 0.5,
+        keepalive: float = 15,
+    ) -> None:
+        self.render = render
+        self.interval = interval
+        self.keepalive = keepalive
+        self._subscribers: dict[Key, set[_Subscriber]] = defaultdict(set)
+        self._points: dict[Key, dict[Key, Value]] = {}
+        self._fragments: dict[tuple[Key, bool], str] = {}
+        self._pending: dict[Key, asyncio.Task[None]] = {}
+
+    def notify(self, database: AsyncDatabase, key: Key) -> None:
+        if not self._subscribers.get(key) or key in self._pending:
+            return
+        # in a context of its own, the results must not come from the identity map of the request that voted
+        self._pending[key] = asyncio.get_running_loop().create_task(
+            self._publish_later(database, key),
+            context=contextvars.Context(),
+        )
+
+    async def stream(
+        self,
+        key: Key,
+        *,
+        no_sort: bool,
+        is_disconnected: Callable[[], Awaitable[bool]],
+    ) -> AsyncIterator[str]:
+        subscriber = _Subscriber(no_sort)
+        self._subscribers[key].add(subscriber)
+        try:
+            if fragment := self._fragments.get((key, no_sort)):
+                yield _event("results", fragment)
+            while not await is_disconnected():
+                try:
+                    await asyncio.wait_for(subscriber.changed.wait(), self.keepalive)
+                except TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                subscriber.changed.clear()
+                if subscriber.fragment is not None:
+                    yield _event("results", subscriber.fragment)
+        finally:
+            self._subscribers[key].discard(subscriber)
+            if not self._subscribers[key]:
+                del self._subscribers[key]
+                self._points.pop(key, None)
+                self._fragments.pop((key, False), None)
+                self._fragments.pop((key, True), None)
+
+    async def _publish_later(self, database: AsyncDatabase, key: Key) -> None:
+        try:
+            await asyncio.sleep(self.interval)
+        finally:
+            del self._pending[key]
+        try:
+            await self.publish(database, key)
+        except DatabaseError:
+            _logger.exception("Unable to publish results of game %s", key)
+
+    async def publish(self, database: AsyncDatabase, key: Key) -> None:
+        subscribers = self._subscribers.get(key)
+        if not subscribers:
+            return
+        results = await database.results(key)
+        points = {result.item.key: result.score for result in results}
+        if points == self._points.get(key):
+            return
+        self._points[key] = points
+        game = await database.load_game_metadata(key)
+        for no_sort in {subscriber.no_sort for subscriber in subscribers}:
+            fragment = self._fragments[key, no_sort] = self.render(game, results, no_sort)
+            for subscriber in subscribers:
+                if subscriber.no_sort == no_sort:
+                    subscriber.fragment = fragment
+                    subscriber.changed.set()
+        _logger.debug("Pushed results of game %s to %d subscribers", key, len(subscribers))
+
+
+def _render_results(game: GameMetadata, results: list[ItemResult], no_sort: bool) -> str:  # noqa: FBT001
+    return render_template("partials/game_results.html", {
+        "game": game,
+        "results": results,
+        "no_sort": no_sort,
+        "live": True,
+    })
+
+
+results_hub = ResultsHub(_render_results)
+
+
+def _event(name: str, data: str) -> str:
+    lines = "".join(f"data: {line}\n" for line in data.splitlines())
+    return f"event: {name}\n{lines}\n"
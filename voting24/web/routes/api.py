@@ -0,0 +1,129 @@
+from typing import Annotated
+
+from fastapi import Cookie, Depends, HTTPException, Query, Request, Response
+from fastapi.routing import APIRouter
+from pydantic import BaseModel, Field
+
+from voting24.db.async_database import AsyncDatabase
+from voting24.db.database import GameNotFoundError
+from voting24.game.game import ItemResult, Key, Name
+from voting24.web.caching import cache_headers, game_etag, not_modified
+from voting24.web.dependencies import get_async_database
+from voting24.web.results_cache import GameResults, results_cache
+from voting24.web.results_hub import results_hub
+
+router = APIRouter(
+    prefix="/api/game/{key}",
+)
+
+
+class ItemStats(BaseModel):
+    key: Key
+    title: str
+    count: int
+    score: int
+    rank: int
+    # number of votes per choice key, in the order of the options
+    distribution: dict[Key, int]
+    mean: float
+    variance: float
+    controversy: float
+
+    @classmethod
+    def of(cls, result: ItemResult) -> "ItemStats":
+        return cls(
+            key=result.item.key,
+            title=result.item.title,
+            count=result.count,
+            score=result.score,
+            rank=result.rank,
+            distribution=result.histogram,
+            mean=result.mean,
+            variance=result.variance,
+            controversy=result.controversy,
+        )
+
+
+class GameStats(BaseModel):
+    key: Key
+    name: str
+    items: list[ItemStats]
+
+
+class VoteRequest(BaseModel):
+    item: Key
+    vote: Key
+
+
+class VoteBatch(BaseModel):
+    # a player catching up on every item of a game, with room to spare
+    votes: list[VoteRequest] = Field(max_length=256)
+
+
+class VoteResult(BaseModel):
+    item: Key
+    vote: Key
+    ok: bool
+    error: str | None = None
+
+
+@router.get("/stats", response_model=GameStats)
+async def get_stats(
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
+    request: Request,
+    key: Key,
+) -> Response:
+    # From the tallies the game keeps up to date with every vote, or counted by the database without loading the players
+    try:
+        etag = game_etag(key, await database.game_version(key))
+        if response := not_modified(request, etag):
+            return response
+        game = await database.load_game_metadata(key)
+        results = await database.results(key)
+    except GameNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Game {key} not found") from None
+    stats = GameStats(key=game.key, name=game.name, items=[ItemStats.of(result) for result in results])
+    return Response(stats.model_dump_json(), media_type="application/json", headers=cache_headers(etag))
+
+
+@router.get("/results", response_model=GameResults)
+async def get_results(
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
+    request: Request,
+    key: Key,
+    since: Annotated[int | None, Query()] = None,
+) -> Response:
+    # For overlays that poll all the time: the body is serialized once per version of the game. With since, only the
+    # items that changed after that version are included, unless it is too old to be remembered.
+    try:
+        version = await database.game_version(key)
+        etag = game_etag(key, version)
+        if response := not_modified(request, etag):
+            return response
+        body = await results_cache.results(database, key, version, since)
+    except GameNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Game {key} not found") from None
+    return Response(body, media_type="application/json", headers=cache_headers(etag))
+
+
+@router.post("/votes")
+async def post_votes(
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
+    key: Key,
+    batch: VoteBatch,
+    player_name: Annotated[Name | None, Cookie()] = None,
+) -> list[VoteResult]:
+    # All votes of the joined player in one request, applied with a single load and write of the game. Every vote
+    # succeeds or fails on its own, the results are in the order of the votes.
+    if not player_name:
+        raise HTTPException(status_code=401, detail="Join the game first")
+    try:
+        errors = await database.vote_many(key, [(player_name, vote.item, vote.vote) for vote in batch.votes])
+    except GameNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Game {key} not found") from None
+    if None in errors:
+        results_hub.notify(database, key)
+    return [
+        VoteResult(item=vote.item, vote=vote.vote, ok=error is None, error=str(error) if error else None)
+        for vote, error in zip(batch.votes, errors, strict=True)
+    ]
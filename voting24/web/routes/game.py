@@ -1,28 +1,35 @@
 from typing import Annotated
 
-from fastapi import Depends, Form, HTTPException, Query, Response
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import Depends, Form, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.routing import APIRouter
 
-from voting24.db.database import Database, GameNotFoundError, PlayerAlreadyExistsError
+from voting24.db.async_database import AsyncDatabase
+from voting24.db.database import GameNotFoundError, PlayerAlreadyExistsError
 from voting24.game.game import Key, Name
-from voting24.web.dependencies import TemplateResponse, get_database, template
+from voting24.web.caching import cache_headers, game_etag, not_modified
+from voting24.web.dependencies import TemplateResponse, get_async_database, template
+from voting24.web.results_hub import results_hub
 
 router = APIRouter()
 
 
 @router.get("/game/{key}")
-def get_game(
+async def get_game(
     key: Key,
+    request: Request,
     template: Annotated[TemplateResponse, Depends(template)],
-    database: Annotated[Database, Depends(get_database)],
-) -> HTMLResponse:
-    return template("game.html", {"game": database.load_game(key)})
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
+) -> Response:
+    etag = game_etag(key, await database.game_version(key))
+    if response := not_modified(request, etag):
+        return response
+    return template("game.html", {"game": await database.load_game_metadata(key)}, headers=cache_headers(etag))
 
 
 @router.post("/game/{key}/join")
-def join_game(
-    database: Annotated[Database, Depends(get_database)],
+async def join_game(
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
     template: Annotated[TemplateResponse, Depends(template)],
     key: Key,
     player_name: Annotated[Name, Form()],
@@ -30,12 +37,12 @@ def join_game(
 ) -> Response:
     player_name = player_name.strip()
     try:
-        database.join_game(key, player_name, join_as_existing=force == 1)
+        await database.join_game(key, player_name, join_as_existing=force == 1)
     except PlayerAlreadyExistsError:
         return template(
             "game.html",
             {
-                "game": database.load_game(key),
+                "game": await database.load_game_metadata(key),
                 "join": {
                     "player_name": player_name,
                     "player_exists": True,
@@ -52,42 +59,78 @@ def join_game(
 
 
 @router.get("/game/{key}/results")
-def get_results(
-    database: Annotated[Database, Depends(get_database)],
+async def get_results(
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
     template: Annotated[TemplateResponse, Depends(template)],
+    request: Request,
     key: Key,
 ) -> Response:
     try:
-        return template("game_results.html", {"game": database.load_game(key)})
+        etag = game_etag(key, await database.game_version(key))
+        if response := not_modified(request, etag):
+            return response
+        return template("game_results.html", {
+            "game": await database.load_game_metadata(key),
+            "results": await database.results(key),
+        }, headers=cache_headers(etag))
     except GameNotFoundError:
         return Response(status_code=404, content=f"Game {key} not found")
 
 
 @router.get("/game/{key}/results.htmx")
-def get_results_htmx(
-    database: Annotated[Database, Depends(get_database)],
+async def get_results_htmx(  # noqa: PLR0913, PLR0917
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
     template: Annotated[TemplateResponse, Depends(template)],
+    request: Request,
     key: Key,
     original_order: Annotated[bool, Query()] = False,  # noqa: FBT002  # allow boolean args in routes
+    live: Annotated[bool, Query()] = False,  # noqa: FBT002  # allow boolean args in routes
 ) -> Response:
     try:
+        etag = game_etag(key, await database.game_version(key))
+        if response := not_modified(request, etag):
+            return response
         return template("partials/game_results.html", {
-            "game": database.load_game(key),
+            "game": await database.load_game_metadata(key),
+            "results": await database.results(key),
             "no_sort": original_order,
-        })
+            "live": live,
+        }, headers=cache_headers(etag))
+    except GameNotFoundError:
+        return Response(status_code=404, content=f"Game {key} not found")
+
+
+@router.get("/game/{key}/results/events")
+async def get_results_events(
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
+    request: Request,
+    key: Key,
+    original_order: Annotated[bool, Query()] = False,  # noqa: FBT002  # allow boolean args in routes
+) -> Response:
+    try:
+        await database.load_game_metadata(key)
     except GameNotFoundError:
         return Response(status_code=404, content=f"Game {key} not found")
+    return StreamingResponse(
+        results_hub.stream(key, no_sort=original_order, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/game/{key}/custom.css")
-def get_custom_css(
-    database: Annotated[Database, Depends(get_database)],
+async def get_custom_css(
+    database: Annotated[AsyncDatabase, Depends(get_async_database)],
+    request: Request,
     key: Key,
 ) -> Response:
     try:
-        game = database.load_game(key)
+        etag = game_etag(key, await database.game_version(key))
+        if response := not_modified(request, etag):
+            return response
+        game = await database.load_game_metadata(key)
     except GameNotFoundError:
         raise HTTPException(status_code=404, detail=f"Game {key} not found") from None
     if not game.css:
         raise HTTPException(status_code=404, detail=f"Game {key} has no custom CSS") from None
-    return Response(content=game.css, media_type="text/css")
+    return Response(content=game.css, media_type="text/css", headers=cache_headers(etag))
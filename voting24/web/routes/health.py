@@ -0,0 +1,12 @@
+from fastapi import Request, Response
+from fastapi.routing import APIRouter
+
+router = APIRouter()
+
+
+@router.get("/ready")
+async def get_ready(request: Request) -> Response:
+    # 503 until the warm-up has finished, so that a load balancer keeps traffic away from a cold instance
+    if not getattr(request.app.state, "ready", False):
+        return Response("warming up", status_code=503, media_type="text/plain")
+    return Response("ready", media_type="text/plain")
@@ -0,0 +1,10 @@
+from fastapi.routing import APIRouter
+
+from voting24.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics() -> dict[str, float]:
+    return metrics.snapshot()
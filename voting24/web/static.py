@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Self
+
+from fastapi import Request, Response
+
+from voting24.web.assets import IMMUTABLE, ui_path
+from voting24.web.caching import not_modified
+
+try:
+    from brotli import compress as brotli_compress  # type: ignore[import-not-found,import-untyped,unused-ignore]
+except ImportError:  # it's an optional extra
+    brotli_compress = None
+
+_logger = logging.getLogger(__name__)
+
+# the scripts the templates load, nothing else from node_modules is served
+NPM_SCRIPTS = (
+    "htmx.org/dist/htmx.min.js",
+    "htmx.org/dist/ext/sse.js",
+)
+
+
+@dataclass
+class StaticFile:
+    digest: str
+    modified: datetime
+    # the content per content coding, only the codings that make it smaller
+    encodings: dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def read(cls, path: Path) -> Self:
+        content = path.read_bytes()
+        static_file = cls(
+            digest=hashlib.sha256(content).hexdigest()[:16],
+            modified=datetime.fromtimestamp(path.stat().st_mtime, UTC),
+            encodings={"identity": content},
+        )
+        compressed = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli_compress:
+            compressed["br"] = brotli_compress(content)
+        for encoding, data in compressed.items():
+            if len(data) < len(content):
+                static_file.encodings[encoding] = data
+        return static_file
+
+
+class StaticFiles:
+    # A fixed set of files read and compressed once, and served from memory with validators and negotiated
+    # content coding. URLs made by url() carry the content digest, so they can be cached forever.
+
+    def __init__(self, root: Path, names: Iterable[str], prefix: str, media_type: str) -> None:
+        self.root = root
+        self.names = tuple(names)
+        self.prefix = prefix
+        self.media_type = media_type
+        self._files: dict[str, StaticFile] | None = None
+
+    def load(self) -> dict[str, StaticFile]:
+        files = {}
+        for name in self.names:
+            try:
+                files[name] = StaticFile.read(self.root / name)
+            except FileNotFoundError:
+                _logger.warning("Static file %s not found from %s", name, self.root)
+        self._files = files
+        return files
+
+    def get(self, name: str) -> StaticFile | None:
+        files = self._files if self._files is not None else self.load()
+        return files.get(name)
+
+    def url(self, name: str) -> str:
+        if static_file := self.get(name):
+            return f"{self.prefix}{name}?v={static_file.digest}"
+        return f"{self.prefix}{name}"
+
+    def response(self, request: Request, name: str) -> Response:
+        static_file = self.get(name)
+        if not static_file:
+            return Response(status_code=404)
+        encoding = _negotiate(request.headers.get("accept-encoding", ""), static_file.encodings)
+        # every coding is a different representation and so needs its own tag
+        etag = f'"{static_file.digest}"' if encoding == "identity" else f'"{static_file.digest}-{encoding}"'
+        versioned = request.query_params.get("v") == static_file.digest
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(static_file.modified, usegmt=True),
+            "Cache-Control": IMMUTABLE if versioned else "public, max-age=86400",
+            "Vary": "Accept-Encoding",
+        }
+        if response := not_modified(request, etag, headers, static_file.modified):
+            return response
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(static_file.encodings[encoding], media_type=self.media_type, headers=headers)
+
+
+def _negotiate(accept_encoding: str, available: Iterable[str]) -> str:
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, parameters = part.strip().partition(";")
+        quality = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+npm_scripts = StaticFiles(ui_path / "node_modules", NPM_SCRIPTS, "/js/npm/", "text/javascript")
+
+
+def script_url(name: str) -> str:
+    return npm_scripts.url(name)
@@ -1,52 +1,44 @@
 import logging
-import subprocess  # noqa: S404
-from dataclasses import dataclass
 from pathlib import Path
 from typing import Annotated
 
-from fastapi import HTTPException, Response
+from fastapi import HTTPException, Request, Response
 from fastapi.routing import APIRouter
 from pydantic import Field
 
-_ui_path = Path(__file__).parent.parent.parent / "ui"
-
-
-@dataclass
-class _CacheItem:
-    modified: float
-    output: str
+from voting24.web import assets, static
+from voting24.web.assets import IMMUTABLE, CompileCache, SassError, dev_mode
 
+_ui_path = Path(__file__).parent.parent.parent / "ui"
 
-_rendering_cache: dict[Path, _CacheItem] = {}
+_compile_cache = CompileCache(_ui_path, assets.cache_path)
 
 
 def _render(file_path: Path) -> str:
     if not (_ui_path / file_path).exists():
         raise HTTPException(status_code=404)
-
-    modified = (_ui_path / file_path).stat().st_mtime
-    output = None
-    if file_path not in _rendering_cache or _rendering_cache[file_path].modified < modified:
-        result = subprocess.run(
-            [  # noqa: S603  # it's not untrusted content
-                "/usr/bin/npx",
-                "sass",
-                "--no-source-map",
-                str(file_path),
-            ],
-            capture_output=True,
-            text=True,
-            cwd=str(_ui_path),
-            check=False,
-        )
-        if result.returncode != 0:
-            logging.error("sass error: %s", result.stderr)
-            raise HTTPException(status_code=500, detail=result.stderr)
-        output = result.stdout
-        _rendering_cache[file_path] = _CacheItem(modified, output)
-    else:
-        output = _rendering_cache[file_path].output
-    return output
+    try:
+        return _compile_cache.get(file_path)
+    except SassError as e:
+        logging.exception("sass error")
+        raise HTTPException(status_code=500, detail=str(e)) from None
+
+
+def precompile_stylesheets() -> int:
+    # In dev mode every stylesheet is compiled into the cache, otherwise the built ones are read into memory
+    if not dev_mode():
+        for file_name in assets.manifest.files.values():
+            assets.manifest.content(file_name)
+        return len(assets.manifest.files)
+    compiled = 0
+    for file_path in sorted((_ui_path / "styles").glob("[!_]*.scss")):
+        try:
+            _compile_cache.get(file_path.relative_to(_ui_path))
+        except (SassError, OSError):
+            logging.exception("Unable to precompile %s", file_path)
+        else:
+            compiled += 1
+    return compiled
 
 
 script_router = APIRouter(
@@ -59,23 +51,21 @@ style_router = APIRouter(
 
 
 @script_router.get("/npm/{script_file:path}.js")
-def serve_npm_script(script_file: Annotated[str, Field(pattern=r"^[\w\-]+((\.|/)([\w\-]+))*$")]) -> Response:
-    file_path = Path("node_modules") / (script_file + ".js")
-    full_path = _ui_path / file_path
-    if not full_path.is_absolute() or not full_path.exists():
-        raise HTTPException(status_code=404)
-    return Response(
-        (_ui_path / file_path).read_text(),
-        media_type="text/javascript",
-    )
+def serve_npm_script(
+    request: Request,
+    script_file: Annotated[str, Field(pattern=r"^[\w\-]+((\.|/)([\w\-]+))*$")],
+) -> Response:
+    return static.npm_scripts.response(request, script_file + ".js")
 
 
 @style_router.get("/{css_file:path}.css")
-def serve_css(css_file: Annotated[str, Field(pattern=r"^[\w-]+$")]) -> Response:
-    file_path = Path("styles") / (css_file + ".scss")
-
-    content = _render(file_path)
-    return Response(
-        content,
-        media_type="text/css",
-    )
+def serve_css(css_file: Annotated[str, Field(pattern=r"^[\w-]+(\.[0-9a-f]{12})?$")]) -> Response:
+    if dev_mode():
+        return Response(_render(Path("styles") / (css_file.split(".")[0] + ".scss")), media_type="text/css")
+
+    # The hashed file names never change content, the plain names point to the latest build
+    if content := assets.manifest.content(css_file + ".css"):
+        return Response(content, media_type="text/css", headers={"Cache-Control": IMMUTABLE})
+    if (built := assets.manifest.files.get(css_file + ".css")) and (content := assets.manifest.content(built)):
+        return Response(content, media_type="text/css", headers={"Cache-Control": "no-cache"})
+    raise HTTPException(status_code=404)
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import time
+from os import environ
+
+import anyio.to_thread
+from fastapi import FastAPI
+
+from voting24.db.async_database import AsyncDatabase
+from voting24.web.dependencies import precompile_templates
+from voting24.web.ui import precompile_stylesheets
+
+_logger = logging.getLogger(__name__)
+
+
+def start_warm_up(app: FastAPI, database: AsyncDatabase) -> asyncio.Task[None]:
+    app.state.ready = False
+    task = asyncio.create_task(warm_up(app, database))
+    task.add_done_callback(lambda task: _warmed_up(app, task))
+    return task
+
+
+def _warmed_up(app: FastAPI, task: asyncio.Task[None]) -> None:
+    if task.cancelled() or (error := task.exception()) is None:
+        return
+    # the caches are only an optimization, serving with cold ones beats never being ready
+    _logger.error("Warm-up failed, serving with cold caches", exc_info=error)
+    app.state.ready = True
+
+
+async def warm_up(app: FastAPI, database: AsyncDatabase) -> None:
+    # Runs in the background after startup, the app reports ready once the caches the first requests need are filled
+    started = time.perf_counter()
+    games = await _preload_games(database, int(environ.get("WARMUP_GAMES", "10")))
+    templates = await anyio.to_thread.run_sync(precompile_templates)
+    stylesheets = await anyio.to_thread.run_sync(precompile_stylesheets)
+    app.state.ready = True
+    _logger.info(
+        "Ready after %.2f s, preloaded %d games, %d templates and %d stylesheets",
+        time.perf_counter() - started,
+        games,
+        templates,
+        stylesheets,
+    )
+
+
+async def _preload_games(database: AsyncDatabase, limit: int) -> int:
+    loaded = 0
+    for key in (await database.game_keys())[:limit]:
+        try:
+            await database.load_game(key)
+        except Exception:  # noqa: BLE001  # a broken game must not keep the others from loading
+            _logger.warning("Unable to preload game %s", key, exc_info=True)
+        else:
+            loaded += 1
+    return loaded